@@ -0,0 +1,72 @@
+"""
+Compares per-query fuzzy matching (process.extract per ingredient) with the vectorized
+cdist matcher (NutritionalValueExtractor.match_many) for 10, 100 and 10,000 queries.
+
+Usage:
+    python -m benchmarks.bench_fuzzy_matching [path/to/nutrition.csv]
+"""
+import logging
+import random
+import sys
+import time
+from rapidfuzz import process, fuzz
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+DEFAULT_CSV = "src/data/nutrition_source.csv"
+COMMON_INGREDIENTS = [
+    "onion", "tomato", "salt", "oil", "turmeric powder", "red chili powder", "garam masala",
+    "paneer", "butter", "ghee", "rice", "cumin seeds", "coriander powder", "curd", "green chilli",
+]
+
+
+def make_queries(extractor: NutritionalValueExtractor, count: int, seed: int = 0) -> list:
+    """
+    Builds a reproducible mix of common ingredient names and shuffled/misspelled food names.
+    """
+    rng = random.Random(seed)
+    names = extractor.index.normalized_names
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.3:
+            queries.append(rng.choice(COMMON_INGREDIENTS))
+            continue
+        words = rng.choice(names).split()
+        rng.shuffle(words)
+        query = " ".join(words[:rng.randint(1, len(words))])
+        if query and rng.random() < 0.5:
+            position = rng.randrange(len(query))
+            query = query[:position] + query[position + 1:]
+        queries.append(query)
+    return queries
+
+
+def per_query(extractor: NutritionalValueExtractor, queries: list) -> list:
+    return [
+        [(position, score) for _, score, position in process.extract(
+            query, extractor.index.normalized_names, scorer=fuzz.token_sort_ratio,
+            limit=extractor.top_n, score_cutoff=extractor.score_cutoff
+        )]
+        for query in queries
+    ]
+
+
+def main(csv_path: str = DEFAULT_CSV):
+    logging.disable(logging.INFO)
+    extractor = NutritionalValueExtractor(csv_path)
+    print(f"{'queries':>8} {'per-query (ms)':>15} {'cdist (ms)':>11} {'speedup':>8}  identical")
+    for count in (10, 100, 10000):
+        queries = make_queries(extractor, count)
+
+        start = time.perf_counter()
+        expected = per_query(extractor, queries)
+        baseline_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        actual = extractor.match_many(queries)
+        vectorized_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{count:>8} {baseline_ms:>15.1f} {vectorized_ms:>11.1f} {baseline_ms / vectorized_ms:>7.1f}x  {expected == actual}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
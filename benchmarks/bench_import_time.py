@@ -0,0 +1,79 @@
+"""
+Startup import-time benchmark, based on `python -X importtime`.
+
+Imports the given module (default: the pipeline module) in a fresh interpreter, prints the
+slowest imports by cumulative time and exits with status 1 if the total exceeds the module's
+budget (see BUDGETS_MS) or if a module that must stay lazy (pandas, langchain, ...) was imported
+at startup.
+
+Usage:
+    python -m benchmarks.bench_import_time [--module src.nutrition_calculator] [--budget-ms 750] [--top 15]
+    python -m benchmarks.bench_import_time --module main
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Heavy dependencies that must only be imported on first use, never at module import time
+LAZY_MODULES = ("pandas", "langchain", "langchain_core", "langchain_google_genai", "rapidfuzz")
+
+# Import budget per module, in milliseconds. The pipeline module measured 210-260ms and main (the
+# API) 690-810ms, about 400ms of which is FastAPI and pydantic: the app and its routes are declared
+# at import time, so those cannot be deferred like the LLM clients.
+BUDGETS_MS = {"src.nutrition_calculator": 750.0, "main": 1000.0}
+DEFAULT_BUDGET_MS = 750.0
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str) -> list:
+    """
+    Runs `python -X importtime -c "import <module>"` and returns (cumulative_us, self_us, depth, name) rows.
+    """
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=repo_root, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        sys.exit(completed.stderr)
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.nutrition_calculator")
+    parser.add_argument("--budget-ms", type=float, help="Defaults to the module's entry in BUDGETS_MS, or 750.")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    if args.budget_ms is None:
+        args.budget_ms = BUDGETS_MS.get(args.module, DEFAULT_BUDGET_MS)
+
+    rows = measure(args.module)
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    print(f"import {args.module}: {total_ms:.1f}ms total, {len(rows)} modules")
+    print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+    for cumulative_us, self_us, _, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {name}")
+
+    failures = []
+    eager = sorted({name.split(".")[0] for _, _, _, name in rows if name.split(".")[0] in LAZY_MODULES})
+    if eager:
+        failures.append(f"modules that should be imported lazily were imported at startup: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
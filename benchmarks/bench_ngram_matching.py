@@ -0,0 +1,147 @@
+"""
+Compares the 'fuzzy' matcher (token_sort_ratio against every row) with the 'ngram' matcher
+(n-gram TF-IDF shortlist re-ranked with token_sort_ratio) on the real ~2k-row table and a
+synthetic 100k-row table built from its words.
+
+Latency is reported per query for single searches (search_food) and for batches (match_many, which
+is what the pipeline calls; the fuzzy matcher scores a batch in one multi-core cdist pass, so the
+n-gram shortlist only pays off for batches on large tables). The n-gram index build is timed on its own. Accuracy is measured against the fuzzy
+matcher, which is exact by definition: top-1 agreement (same best score), recall of its top_n
+rows, and queries for which only the fuzzy matcher found a match.
+
+Usage:
+    python -m benchmarks.bench_ngram_matching [--rows 100000] [--queries 500] [--candidates N] [--output results.json]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from benchmarks.bench_fuzzy_matching import DEFAULT_CSV, make_queries
+from src.steps.ngram_index import NgramIndex
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+# match_many runs per matcher; the median is reported
+BATCH_REPEATS = 3
+
+
+def synthetic_csv(source_csv: str, rows: int, directory: str, seed: int = 0) -> str:
+    """
+    Writes a table of the given size: the real rows followed by names recombined from their words.
+    """
+    rng = random.Random(seed)
+    with open(source_csv, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        real = list(reader)
+    words = sorted({word for row in real for word in row[1].replace(",", " ").replace("(", " ").replace(")", " ").split()})
+
+    path = os.path.join(directory, f"synthetic_{rows}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(real[:rows])
+        for number in range(len(real), rows):
+            template = rng.choice(real)
+            name = " ".join(rng.choice(words) for _ in range(rng.randint(2, 5)))
+            writer.writerow([f"S{number:06d}", name] + template[2:])
+    return path
+
+
+def timed_each(function, items) -> list:
+    durations = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def latency(durations: list) -> dict:
+    ordered = sorted(durations)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "p50_ms": round(ordered[len(ordered) // 2], 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+    }
+
+
+def accuracy(exact: list, approximate: list) -> dict:
+    top1 = recall_hits = recall_total = missed = 0
+    for expected, found in zip(exact, approximate):
+        if not expected:
+            top1 += not found
+            continue
+        top1 += bool(found) and found[0][1] == expected[0][1]
+        missed += not found
+        expected_rows = {position for position, _ in expected}
+        recall_hits += len(expected_rows & {position for position, _ in found})
+        recall_total += len(expected_rows)
+    return {
+        "top1_agreement": round(top1 / len(exact), 4),
+        "recall_at_top_n": round(recall_hits / recall_total, 4) if recall_total else None,
+        "missed_matches": missed,
+    }
+
+
+def run(csv_path: str, query_count: int, seed: int, candidates: int = None) -> dict:
+    fuzzy = NutritionalValueExtractor(csv_path, snapshot_dir="", matcher="fuzzy")
+    ngram = NutritionalValueExtractor(csv_path, snapshot_dir="", matcher="ngram", candidates=candidates)
+    # load_data already built the index; time a separate build of the same index
+    start = time.perf_counter()
+    NgramIndex(ngram.index.normalized_names)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    queries = [fuzzy.normalize(query) for query in make_queries(fuzzy, query_count, seed)]
+    result = {"rows": len(fuzzy.index), "queries": len(queries), "ngram_build_ms": round(build_ms, 1)}
+    for name, extractor in (("fuzzy", fuzzy), ("ngram", ngram)):
+        single = timed_each(extractor.search_food, queries)
+        batch_ms = statistics.median(
+            timed_each(lambda _: extractor.match_many(queries), range(BATCH_REPEATS))
+        )
+        result[name] = {"search_food": latency(single), "match_many_per_query_ms": round(batch_ms / len(queries), 4)}
+    result["match_many_speedup"] = round(
+        result["fuzzy"]["match_many_per_query_ms"] / result["ngram"]["match_many_per_query_ms"], 2
+    )
+
+    result["ngram"]["accuracy"] = accuracy(fuzzy.match_many(queries), ngram.match_many(queries))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="?", default=DEFAULT_CSV, help="Real nutrition CSV.")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows of the synthetic table.")
+    parser.add_argument("--queries", type=int, default=500, help="Queries per table.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic table and the queries.")
+    parser.add_argument("--candidates", type=int, help="Shortlist length of the ngram matcher (default: automatic).")
+    parser.add_argument("--output", help="Optional path of a JSON results file.")
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for csv_path in (args.csv, synthetic_csv(args.csv, args.rows, directory, args.seed)):
+            result = run(csv_path, args.queries, args.seed, args.candidates)
+            results.append(result)
+            accuracy_ = result["ngram"]["accuracy"]
+            print(f"{result['rows']} rows, {result['queries']} queries (n-gram index built in {result['ngram_build_ms']}ms)")
+            for name in ("fuzzy", "ngram"):
+                single = result[name]["search_food"]
+                print(f"  {name:<6} search_food mean={single['mean_ms']:.3f}ms p95={single['p95_ms']:.3f}ms"
+                      f"  match_many={result[name]['match_many_per_query_ms']:.3f}ms/query")
+            print(f"  ngram match_many speedup over fuzzy: {result['match_many_speedup']:.2f}x")
+            print(f"  ngram accuracy: top-1 {accuracy_['top1_agreement']:.1%}, recall@top_n "
+                  f"{accuracy_['recall_at_top_n']:.1%}, missed {accuracy_['missed_matches']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Offline benchmark of the nutrition pipeline using the deterministic fake LLM (src/fake_llm.py).
+
+Covers search_food, estimate_grams, aggregate and aggregate_batch, the full calculate_nutrition and the
+GET /nutrition/{dish_name} route under concurrent load, and writes the results as JSON so runs can
+be compared. No network access or API key is needed. Inputs are generated from --seed, and the
+in-memory ingredient and result caches are cleared before the cold and HTTP runs, so LLM latency
+is included unless stated otherwise.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--latency-ms 50] [--requests 200] [--concurrency 16]
+                                        [--output benchmarks/results/pipeline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+DEFAULT_CSV = "src/data/nutrition_source.csv"
+DISHES = [
+    "paneer butter masala", "dal tadka", "aloo gobi", "chole", "palak paneer", "jeera rice",
+    "rajma", "masala dosa", "vegetable pulao", "kadhi pakora", "baingan bharta", "poha",
+    "upma", "sambar", "rasam", "matar paneer", "bhindi masala", "dum aloo", "khichdi", "pav bhaji",
+]
+QUANTITIES = [
+    ("onion", "2 pieces"), ("salt", "1 tsp"), ("oil", "2 tbsp"), ("rice", "1 cup"), ("milk", "1 glass"),
+    ("paneer", "200 g"), ("ghee", "1 tbsp"), ("green chilli", "3 pieces"), ("curd", "1 katori"),
+    ("saffron strands", "1 pinch"), ("jaggery", "2 blocks"), ("tamarind pulp", "1 small ball"),
+]
+
+
+def summarize(durations: list, wall_s: float = None) -> dict:
+    """
+    Latency summary (in milliseconds) of a list of per-operation durations (in seconds).
+    """
+    ms = sorted(d * 1000 for d in durations)
+    wall_s = wall_s if wall_s is not None else sum(durations)
+
+    def percentile(p: float) -> float:
+        return ms[min(len(ms) - 1, int(round(p / 100 * (len(ms) - 1))))]
+
+    return {
+        "count": len(ms),
+        "total_s": round(wall_s, 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(percentile(50), 4),
+        "p95_ms": round(percentile(95), 4),
+        "p99_ms": round(percentile(99), 4),
+        "max_ms": round(ms[-1], 4),
+        "throughput_per_s": round(len(ms) / wall_s, 2) if wall_s else None,
+    }
+
+
+def time_each(function, items) -> list:
+    durations = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def dish_names(count: int) -> list:
+    return [f"{DISHES[i % len(DISHES)]} {i // len(DISHES) + 1}" for i in range(count)]
+
+
+def bench_search_food(pipeline, count: int, seed: int) -> dict:
+    from benchmarks.bench_fuzzy_matching import make_queries
+
+    queries = make_queries(pipeline.nutrition_extractor, count, seed)
+    return summarize(time_each(pipeline.nutrition_extractor.search_food, queries))
+
+
+def bench_estimate_grams(pipeline, count: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    items = [rng.choice(QUANTITIES) for _ in range(count)]
+    standardizer = pipeline.quantity_standardizer
+    result = summarize(time_each(lambda item: standardizer.estimate_grams(*item), items))
+    result["table_hit_rate"] = round(1 - standardizer.fallback_rate(), 4)
+    return result
+
+
+def make_dishes(pipeline, count: int, seed: int) -> list:
+    # (grams, nutrients) of dishes with 3 to 15 random ingredients, as passed to aggregate
+    rng = random.Random(seed)
+    index = pipeline.nutrition_extractor.index
+    dishes = []
+    for _ in range(count):
+        rows = [rng.randrange(len(index)) for _ in range(rng.randint(3, 15))]
+        dishes.append(([rng.uniform(1, 500) for _ in rows], index.nutrients[rows]))
+    return dishes
+
+
+def bench_aggregate(pipeline, count: int, seed: int, chunk_size: int = 20) -> dict:
+    calculator = pipeline.quantity_calculator
+    dishes = make_dishes(pipeline, count, seed)
+    chunks = [dishes[start:start + chunk_size] for start in range(0, len(dishes), chunk_size)]
+    return {
+        "per_dish": summarize(time_each(lambda dish: calculator.aggregate(*dish), dishes)),
+        f"batch_of_{chunk_size}": summarize(time_each(calculator.aggregate_batch, chunks)),
+    }
+
+
+def bench_calculate_nutrition(pipeline, count: int) -> dict:
+    from src.nutrition_calculator import calculate_nutrition
+
+    names = dish_names(count)
+    pipeline.ingredients_extractor.cache.clear()
+    cold = summarize(time_each(lambda name: calculate_nutrition(name, pipeline), names))
+    warm = summarize(time_each(lambda name: calculate_nutrition(name, pipeline), names))
+    return {"cold": cold, "warm_ingredient_cache": warm}
+
+
+async def _load_test(app, names: list, concurrency: int) -> tuple:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+    statuses = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def request(name: str):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/nutrition/{name}")
+                durations.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(name) for name in names))
+        wall_s = time.perf_counter() - start
+    return durations, wall_s, statuses
+
+
+def bench_http(pipeline, count: int, concurrency: int) -> dict:
+    import main
+
+    main.app.state.pipeline = pipeline
+    pipeline.ingredients_extractor.cache.clear()
+    pipeline.purge_results()
+    durations, wall_s, statuses = asyncio.run(_load_test(main.app, dish_names(count), concurrency))
+    result = summarize(durations, wall_s)
+    result["concurrency"] = concurrency
+    result["status_codes"] = {str(code): n for code, n in sorted(statuses.items())}
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="Nutrition CSV to benchmark against.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated LLM latency per call.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Maximum extra simulated LLM latency.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake LLM and the generated inputs.")
+    parser.add_argument("--iterations", type=int, default=1000, help="Calls for the micro benchmarks.")
+    parser.add_argument("--dishes", type=int, default=20, help="Dishes for calculate_nutrition.")
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests for the load test.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent HTTP requests.")
+    parser.add_argument("--output", default="benchmarks/results/pipeline.json", help="Where to write the JSON results.")
+    args = parser.parse_args(argv)
+
+    # Configure the offline backend before any client is created
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    os.environ["INGREDIENT_CACHE_PATH"] = ""
+    os.environ["RESULT_CACHE_PATH"] = ""
+    os.environ["DISH_CATALOG_PATH"] = ""
+    logging.disable(logging.CRITICAL)
+
+    from src.nutrition_calculator import NutritionPipeline
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    start = time.perf_counter()
+    pipeline = NutritionPipeline(args.csv)
+    startup_s = time.perf_counter() - start
+
+    results = {
+        "run_id": run_id,
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": vars(args),
+        "startup_s": round(startup_s, 4),
+        "benchmarks": {},
+    }
+    benchmarks = results["benchmarks"]
+    benchmarks["search_food"] = bench_search_food(pipeline, args.iterations, args.seed)
+    benchmarks["estimate_grams"] = bench_estimate_grams(pipeline, args.iterations, args.seed)
+    benchmarks["aggregate"] = bench_aggregate(pipeline, args.iterations, args.seed)
+    benchmarks["calculate_nutrition"] = bench_calculate_nutrition(pipeline, args.dishes)
+    benchmarks["http_nutrition"] = bench_http(pipeline, args.requests, args.concurrency)
+
+    for name, result in benchmarks.items():
+        for label, summary in (result.items() if "count" not in result else [("", result)]):
+            print(f"{name + (' ' + label if label else ''):<42} n={summary['count']:<6} "
+                  f"mean={summary['mean_ms']:.3f}ms p95={summary['p95_ms']:.3f}ms")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for running the API with several worker processes:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Before the workers are forked, the master loads the food index once and publishes it into shared
+memory (src/shared_index.py). The segment name is exported in 'NUTRITION_SHM_NAME', which the
+workers inherit, so each worker attaches the shared arrays instead of loading its own copy. A HUP
+signal republishes the index from the current CSV before the workers are restarted.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+_segment = None
+
+
+def _publish(server):
+    global _segment
+    from src.shared_index import publish_csv, release
+
+    previous = _segment
+    _segment = publish_csv(os.getenv("FILE_PATH"))
+    os.environ["NUTRITION_SHM_NAME"] = _segment.name
+    server.log.info("Published the food index in shared memory segment %s (%d bytes)", _segment.name, _segment.size)
+    # Workers that attached the previous segment keep their mapping until they exit
+    if previous is not None:
+        release(previous)
+
+
+def on_starting(server):
+    _publish(server)
+
+
+def on_reload(server):
+    _publish(server)
+
+
+def on_exit(server):
+    if _segment is not None:
+        from src.shared_index import release
+
+        release(_segment)
@@ -1,13 +1,165 @@
-from fastapi import FastAPI
-from src.nutrition_calculator import calculate_nutrition
+import json
+import os
+import asyncio
+import logging
+import secrets
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from src import metrics
+from src.nutrition_calculator import NutritionPipeline
 
-app = FastAPI()
+async def refresh_catalog_periodically(pipeline: NutritionPipeline, interval: float):
+    # Recompute catalog dishes whose inputs changed, off the event loop
+    while True:
+        try:
+            await asyncio.to_thread(pipeline.refresh_catalog)
+        except Exception as e:
+            logging.getLogger("NutritionPipeline").error(f"Catalog refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the pipeline once per process; every request reuses it
+    app.state.pipeline = NutritionPipeline()
+    interval = float(os.getenv("CATALOG_REFRESH_INTERVAL", 3600))
+    refresher = None
+    if interval > 0 and len(app.state.pipeline.catalog):
+        refresher = asyncio.create_task(refresh_catalog_periodically(app.state.pipeline, interval))
+    yield
+    if refresher is not None:
+        refresher.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+def get_pipeline(request: Request) -> NutritionPipeline:
+    return request.app.state.pipeline
+
+def require_admin(request: Request):
+    # Admin routes are only served when ADMIN_TOKEN is set, to callers sending "Authorization: Bearer <token>"
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404)
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+# Lets clients and the CDN reuse a result; revalidation with If-None-Match is cheap
+CACHE_CONTROL = os.getenv("RESULT_CACHE_CONTROL", "public, max-age=3600")
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+# Larger batch requests are rejected with 422
+BATCH_MAX_DISHES = int(os.getenv("BATCH_MAX_DISHES", 500))
+
+class BatchRequest(BaseModel):
+    dish_names: List[str] = Field(max_length=BATCH_MAX_DISHES)
+
+@app.post("/nutrition/batch")
+def get_nutrition_batch(request: BatchRequest, pipeline: NutritionPipeline = Depends(get_pipeline)):
+    # One NDJSON line per distinct dish, streamed as each chunk of dishes completes
+    lines = (json.dumps(entry) + "\n" for entry in pipeline.calculate_batch(request.dish_names))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 @app.get("/nutrition/{dish_name}")
-def get_nutrition(dish_name: str):
-    data, ingredients = calculate_nutrition(dish_name)
+async def get_nutrition(dish_name: str, request: Request, pipeline: NutritionPipeline = Depends(get_pipeline)):
+    if dish_name == "batch":
+        # The path of the batch route matches this route too, so other methods on it would compute a dish named "batch"
+        raise HTTPException(status_code=405, headers={"Allow": "POST"})
+    timings = {}
+    try:
+        result = await pipeline.aget_result(dish_name, timings)
+    except Exception as e:
+        logging.getLogger("NutritionPipeline").error(f"Calculating '{dish_name}' failed: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500, headers={"Cache-Control": "no-store"})
+    if not result.get("cacheable", True):
+        # Failed extractions and incomplete results are recomputed on the next request, so nobody may keep this response
+        headers = {"Cache-Control": "no-store", "Server-Timing": server_timing(timings)}
+        return Response(content=result["body"], media_type="application/json", headers=headers)
+    headers = {
+        "ETag": result["etag"],
+        "Cache-Control": CACHE_CONTROL,
+        "Server-Timing": server_timing(timings)
+    }
+    if etag_matches(request.headers.get("if-none-match"), result["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=result["body"], media_type="application/json", headers=headers)
+
+def sse_event(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
+
+@app.get("/nutrition/{dish_name}/stream")
+async def stream_nutrition(dish_name: str, pipeline: NutritionPipeline = Depends(get_pipeline)):
+    # Server-sent events: the ingredient list, each ingredient as it resolves, then the final result
+    async def events():
+        try:
+            async for event in pipeline.astream(dish_name):
+                yield sse_event(event)
+        except Exception as e:
+            logging.getLogger("NutritionPipeline").error(f"Streaming '{dish_name}' failed: {e}")
+            yield sse_event({"event": "error", "data": {"error": str(e)}})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+def reload_nutrition_data(pipeline: NutritionPipeline = Depends(get_pipeline)):
+    timings = pipeline.reload_data()
+    return {
+        "rows": len(pipeline.nutrition_extractor.index),
+        "timings_ms": timings
+    }
+
+@app.get("/admin/timings", dependencies=[Depends(require_admin)])
+def get_startup_timings(pipeline: NutritionPipeline = Depends(get_pipeline)):
+    return {"startup_ms": pipeline.startup_timings}
+
+@app.get("/admin/cache", dependencies=[Depends(require_admin)])
+def get_cache_stats(pipeline: NutritionPipeline = Depends(get_pipeline)):
     return {
-        "data": data,
-        "ingredients": ingredients
+        "results": pipeline.result_cache.stats(),
+        "ingredients": pipeline.ingredients_extractor.cache.stats(),
+        "resolver": pipeline.resolver.stats()
     }
 
+@app.post("/admin/cache/purge", dependencies=[Depends(require_admin)])
+def purge_cache(dish_name: Optional[str] = None, ingredients: bool = False,
+                pipeline: NutritionPipeline = Depends(get_pipeline)):
+    # Purges cached responses (of one dish, or all); optionally the extracted ingredients too
+    pipeline.purge_results(dish_name)
+    if ingredients:
+        if dish_name is None:
+            pipeline.ingredients_extractor.cache.clear()
+        else:
+            pipeline.ingredients_extractor.cache.delete(pipeline.ingredients_extractor.cache_key(dish_name))
+    return {
+        "purged": dish_name or "all",
+        "ingredients": ingredients,
+        "result_version": pipeline.result_version
+    }
+
+@app.get("/admin/catalog", dependencies=[Depends(require_admin)])
+def get_catalog_stats(pipeline: NutritionPipeline = Depends(get_pipeline)):
+    return pipeline.catalog.stats(pipeline.result_version)
+
+@app.post("/admin/catalog/refresh", dependencies=[Depends(require_admin)])
+def refresh_catalog(pipeline: NutritionPipeline = Depends(get_pipeline)):
+    return pipeline.refresh_catalog()
+
+@app.get("/admin/quantity-table", dependencies=[Depends(require_admin)])
+def get_quantity_table_stats(pipeline: NutritionPipeline = Depends(get_pipeline)):
+    return pipeline.quantity_standardizer.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional time-to-live and hit/miss counters.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size (int): Maximum number of entries kept; the least recently used entry is evicted first.
+            ttl (float): Seconds an entry stays valid. None means entries never expire.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, max_ttl: Optional[float] = None):
+        """
+        Stores value under key, evicting the least recently used entries beyond max_size.
+        max_ttl caps the time-to-live of this entry, e.g. at the remaining lifetime of a copy from disk.
+        """
+        ttl = self.ttl if max_ttl is None else min(self.ttl or max_ttl, max_ttl)
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class SQLiteCache:
+    """
+    Size-bounded, TTL-aware key/value store on disk that survives process restarts.
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, path: str, max_size: int = 100000, ttl: Optional[float] = None):
+        """
+        Args:
+            path (str): Path of the SQLite database file. Parent directories are created if needed.
+            max_size (int): Maximum number of rows kept; the least recently accessed rows are evicted first.
+            ttl (float): Seconds an entry stays valid. None means entries never expire.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str, default=None):
+        """
+        Returns the cached value for key, or default if it is missing or expired.
+        """
+        return self.get_with_ttl(key, default)[0]
+
+    def get_with_ttl(self, key: str, default=None) -> Tuple[Any, Optional[float]]:
+        """
+        Like get, but also returns the seconds the entry stays valid: None if entries never expire
+        or the key is missing.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and (self.ttl is None or row[1] + self.ttl > now):
+                self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return json.loads(row[0]), None if self.ttl is None else row[1] + self.ttl - now
+            if row is not None:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return default, None
+
+    def set(self, key: str, value: Any):
+        """
+        Stores value under key, evicting the least recently accessed rows beyond max_size.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_size
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class TwoTierCache:
+    """
+    In-process LRU in front of an optional on-disk store. Disk hits are promoted into memory for at
+    most the remaining lifetime of the disk entry, so promotion never extends an entry's TTL.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            value = self._promote(key, *self.disk.get_with_ttl(key, _MISSING))
+            if value is not _MISSING:
+                return value
+        return default
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aget(self, key: str, default=None):
+        """
+        Async variant of get: memory hits are answered inline, the disk tier is read in a worker
+        thread so SQLite I/O never blocks the event loop.
+        """
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            value = self._promote(key, *await asyncio.to_thread(self.disk.get_with_ttl, key, _MISSING))
+            if value is not _MISSING:
+                return value
+        return default
+
+    def _promote(self, key: str, value: Any, remaining: Optional[float]):
+        if value is not _MISSING:
+            self.memory.set(key, value, max_ttl=remaining)
+        return value
+
+    async def aset(self, key: str, value: Any):
+        """
+        Async variant of set that writes the disk tier in a worker thread.
+        """
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+    @classmethod
+    def from_env(cls, prefix: str, default_path: str = "") -> "TwoTierCache":
+        """
+        Builds a cache configured from environment variables:
+
+        - {prefix}_PATH: SQLite file for the disk tier (empty disables it).
+        - {prefix}_TTL: Seconds entries stay valid (0 disables expiry). Default is 7 days.
+        - {prefix}_SIZE: Maximum in-memory entries. Default is 1024.
+        - {prefix}_DISK_SIZE: Maximum on-disk entries. Default is 100000.
+        """
+        path = os.getenv(f"{prefix}_PATH", default_path)
+        ttl = float(os.getenv(f"{prefix}_TTL", 7 * 24 * 3600)) or None
+        memory = LRUCache(int(os.getenv(f"{prefix}_SIZE", 1024)), ttl)
+        disk = SQLiteCache(path, int(os.getenv(f"{prefix}_DISK_SIZE", 100000)), ttl) if path else None
+        return cls(memory, disk)
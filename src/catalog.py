@@ -0,0 +1,249 @@
+"""
+Precomputed dish catalog: serialized nutrition results of popular dishes, served without running the pipeline.
+
+Usage:
+    python -m src.catalog path/to/dishes.txt [catalog.json] [--only-stale]
+
+The dish list has one dish name per line. The catalog path defaults to the 'DISH_CATALOG_PATH'
+environment variable, or src/data/dish_catalog.json. With --only-stale, entries of an existing
+catalog that are still current are kept and only missing or outdated dishes are recomputed.
+
+Every entry records the pipeline's result_version (a hash of the nutrition CSV, the prompts and
+models, the gram tables and the result format), so the API only serves entries computed from the
+current inputs and refreshes the others in the background.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from src.log import get_logger
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CATALOG_FORMAT = 1
+DEFAULT_CATALOG_PATH = "src/data/dish_catalog.json"
+
+
+class DishCatalog:
+    """
+    Dish name -> serialized nutrition result ({'body', 'etag', 'events'} as built by NutritionPipeline.make_result),
+    keyed by normalized dish name and stored as one JSON file.
+    """
+
+    def __init__(self, path: str = None, entries: Dict[str, dict] = None):
+        """
+        Args:
+            path (str): File the catalog is loaded from and saved to. None keeps it in memory only.
+            entries (Dict[str, dict]): Entries by normalized dish name.
+        """
+        self.path = path
+        self.entries = entries or {}
+        self._lock = threading.Lock()
+        self.logger = get_logger("DishCatalog")
+
+    @classmethod
+    def load(cls, path: str) -> "DishCatalog":
+        """
+        Loads a catalog file. A missing file gives an empty catalog; a file written in another
+        format version is ignored with a warning.
+        """
+        catalog = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return catalog
+        except (OSError, ValueError) as e:
+            catalog.logger.warning(f"Could not read dish catalog '{path}': {e}")
+            return catalog
+        if data.get("format") != CATALOG_FORMAT:
+            catalog.logger.warning(f"Ignoring dish catalog '{path}' in format {data.get('format')}")
+            return catalog
+        catalog.entries = data.get("dishes", {})
+        catalog.logger.info(f"Loaded {len(catalog.entries)} dishes from '{path}'")
+        return catalog
+
+    @classmethod
+    def from_env(cls) -> "DishCatalog":
+        """
+        Loads the catalog at 'DISH_CATALOG_PATH' (default src/data/dish_catalog.json). An empty value disables it.
+        """
+        path = os.getenv("DISH_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+        return cls.load(path) if path else cls()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, dish_name: str, result_version: str) -> Optional[dict]:
+        """
+        Returns the entry of a dish if it was computed for the given result version, else None.
+        """
+        entry = self.entries.get(NutritionalValueExtractor.normalize(dish_name))
+        if entry is None or entry.get("result_version") != result_version:
+            return None
+        return entry
+
+    def stale(self, result_version: str) -> List[str]:
+        """
+        Dish names whose entries were computed for another result version.
+        """
+        return [entry["dish_name"] for entry in self.entries.values() if entry.get("result_version") != result_version]
+
+    def set(self, dish_name: str, result: dict, result_version: str):
+        """
+        Stores a dish's serialized result ({'body', 'etag'}) computed for the given result version.
+        """
+        entry = {
+            "dish_name": dish_name,
+            "result_version": result_version,
+            "computed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **result,
+        }
+        with self._lock:
+            self.entries[NutritionalValueExtractor.normalize(dish_name)] = entry
+
+    def save(self, path: str = None):
+        """
+        Writes the catalog atomically (temporary file and rename), so readers never see a partial file.
+        """
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {
+                "format": CATALOG_FORMAT,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "dishes": dict(self.entries),
+            }
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(data, f)
+        os.replace(temporary, path)
+
+    def reload(self):
+        """
+        Re-reads the entries from the catalog file, e.g. after another process refreshed it.
+        A missing or unreadable file keeps the current entries.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        loaded = DishCatalog.load(self.path)
+        if loaded.entries:
+            with self._lock:
+                self.entries = loaded.entries
+
+    @contextmanager
+    def refresh_lock(self):
+        """
+        Takes an exclusive, non-blocking lock on '<path>.lock', so only one process (e.g. one of several
+        API workers) refreshes the catalog at a time. Yields whether the lock was acquired; an in-memory
+        catalog, or a platform without fcntl, always acquires it.
+        """
+        if not self.path or fcntl is None:
+            yield True
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self, result_version: str) -> dict:
+        return {
+            "path": self.path,
+            "dishes": len(self.entries),
+            "stale": len(self.stale(result_version)),
+        }
+
+
+def compute_entries(pipeline, catalog: DishCatalog, dish_names: Iterable[str]) -> Dict[str, str]:
+    """
+    Computes the given dishes with the batched pipeline and stores them in the catalog.
+    Dishes without extracted ingredients and incomplete dishes (an ingredient without an estimated
+    weight, see NutritionPipeline.is_complete) are not stored.
+
+    Args:
+        pipeline (NutritionPipeline): The pipeline used to compute the dishes.
+        catalog (DishCatalog): Receives the computed entries.
+        dish_names (Iterable[str]): The dishes to compute.
+
+    Returns:
+        Dict[str, str]: Error message by dish name for the dishes that could not be computed.
+    """
+    errors = {}
+    version = pipeline.result_version
+    for entry in pipeline.calculate_batch(list(dish_names), with_events=True):
+        if "error" in entry:
+            errors[entry["dish_name"]] = entry["error"]
+        elif not entry["ingredients"]:
+            errors[entry["dish_name"]] = "Could not extract ingredients"
+        elif entry["data"].get("incomplete"):
+            failed = ", ".join(error["ingredient"] for error in entry["data"]["errors"])
+            errors[entry["dish_name"]] = f"Could not estimate the weight of: {failed}"
+        else:
+            catalog.set(entry["dish_name"], pipeline.make_result(entry["data"], entry["ingredients"], entry["events"]), version)
+    return errors
+
+
+def build_catalog(dish_names: List[str], path: str, pipeline=None, only_stale: bool = False) -> DishCatalog:
+    """
+    Computes the nutrition of every dish and writes the catalog file.
+
+    Args:
+        dish_names (List[str]): The dishes to include.
+        path (str): Catalog file to write.
+        pipeline (NutritionPipeline): Defaults to the process-wide pipeline.
+        only_stale (bool): Keep current entries of an existing catalog at path and only compute the rest.
+
+    Returns:
+        DishCatalog: The written catalog.
+    """
+    from src.nutrition_calculator import get_pipeline
+
+    pipeline = pipeline or get_pipeline()
+    catalog = DishCatalog.load(path) if only_stale else DishCatalog(path)
+    wanted = list(dict.fromkeys(name.strip() for name in dish_names if name.strip()))
+    pending = [name for name in wanted if catalog.get(name, pipeline.result_version) is None]
+    catalog.logger.info(f"Computing {len(pending)} of {len(wanted)} dishes")
+    for name, error in compute_entries(pipeline, catalog, pending).items():
+        catalog.logger.warning(f"Skipping '{name}': {error}")
+    catalog.save()
+    return catalog
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Builds the precomputed dish catalog.")
+    parser.add_argument("dishes", help="Text file with one dish name per line.")
+    parser.add_argument("catalog", nargs="?", default=os.getenv("DISH_CATALOG_PATH") or DEFAULT_CATALOG_PATH,
+                        help="Catalog file to write.")
+    parser.add_argument("--only-stale", action="store_true", help="Only recompute missing or outdated dishes.")
+    args = parser.parse_args(argv)
+
+    with open(args.dishes) as f:
+        dish_names = f.read().splitlines()
+    start = time.perf_counter()
+    catalog = build_catalog(dish_names, args.catalog, only_stale=args.only_stale)
+    print(f"Wrote {len(catalog)} dishes to {args.catalog} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Deterministic stand-in for the Gemini chat model, used to run the pipeline and benchmarks offline.
+
+FakeChatModel recognizes the prompts of IngredientsExtractor and QuantityStandardizer and answers them
+with canned or seeded JSON ingredient lists and gram estimates after a configurable simulated latency.
+The same seed and prompt always produce the same answer.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Dict, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+# (ingredient, quantity) pairs seeded ingredient lists are drawn from
+INGREDIENT_POOL = [
+    ("onion", "2 pieces"), ("tomato", "2 pieces"), ("oil", "2 tbsp"), ("ghee", "1 tbsp"),
+    ("salt", "1 tsp"), ("turmeric powder", "1/2 tsp"), ("red chili powder", "1 tsp"),
+    ("garam masala", "1 tsp"), ("cumin seeds", "1 tsp"), ("coriander powder", "1 tsp"),
+    ("ginger garlic paste", "1 tbsp"), ("green chilli", "2 pieces"), ("paneer", "1 cup"),
+    ("rice", "1 cup"), ("toor dal", "1 cup"), ("potato", "3 pieces"), ("curd", "1/2 cup"),
+    ("butter", "2 tbsp"), ("cashew paste", "1/4 cup"), ("coriander leaves", "2 tbsp"),
+    ("wheat flour", "2 cup"), ("milk", "1 cup"), ("sugar", "2 tbsp"), ("chickpeas", "1 cup"),
+    ("spinach", "2 cup"), ("mustard seeds", "1 tsp"), ("curry leaves", "10 pieces"),
+    ("cauliflower", "1 piece"), ("green peas", "1/2 cup"), ("cream", "1/4 cup"),
+]
+
+RECIPE_PATTERN = re.compile(r"Extract ingredients for (.+?) with these requirements", re.S)
+SINGLE_PATTERN = re.compile(r"Estimate the weight in grams of (.+?) based on", re.S)
+BATCH_ITEM_PATTERN = re.compile(r"^(\d+)\. (.+)$", re.M)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers pipeline prompts locally and deterministically.
+
+    Attributes:
+        latency_ms (float): Simulated latency of every call.
+        jitter_ms (float): Maximum extra latency, drawn deterministically from the prompt.
+        seed (int): Seed mixed into every generated answer.
+        ingredients (Dict[str, List[dict]]): Canned ingredient lists by normalized dish name;
+            other dishes get a seeded list drawn from INGREDIENT_POOL.
+        grams (Dict[str, float]): Canned gram estimates by quantity description.
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    seed: int = 0
+    ingredients: Dict[str, List[dict]] = {}
+    grams: Dict[str, float] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _rng(self, text: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}|{text}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _delay(self, prompt: str) -> float:
+        return (self.latency_ms + self._rng(prompt).random() * self.jitter_ms) / 1000
+
+    def _ingredients_for(self, recipe_name: str) -> List[dict]:
+        canned = self.ingredients.get(NutritionalValueExtractor.normalize(recipe_name))
+        if canned is not None:
+            return canned
+        rng = self._rng(NutritionalValueExtractor.normalize(recipe_name))
+        return [
+            {"quantity": quantity, "ingredient": ingredient}
+            for ingredient, quantity in rng.sample(INGREDIENT_POOL, rng.randint(4, 9))
+        ]
+
+    def _grams_for(self, description: str) -> float:
+        description = description.strip()
+        if description in self.grams:
+            return self.grams[description]
+        return float(self._rng(description).randint(5, 400))
+
+    def respond(self, prompt: str) -> str:
+        """
+        Returns the answer text for a prompt.
+        """
+        recipe = RECIPE_PATTERN.search(prompt)
+        if recipe:
+            return json.dumps({"ingredients": self._ingredients_for(recipe.group(1))})
+        if '"items"' in prompt:
+            items = [
+                {"id": int(item_id), "grams": self._grams_for(description)}
+                for item_id, description in BATCH_ITEM_PATTERN.findall(prompt)
+            ]
+            return json.dumps({"items": items})
+        single = SINGLE_PATTERN.search(prompt)
+        if single:
+            return f"{self._grams_for(single.group(1)):g}"
+        return "{}"
+
+    def _result(self, messages) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = self.respond(prompt)
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(text) // 4,
+            "total_tokens": len(prompt) // 4 + len(text) // 4,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay("\n".join(str(message.content) for message in messages)))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay("\n".join(str(message.content) for message in messages)))
+        return self._result(messages)
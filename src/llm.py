@@ -0,0 +1,220 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+_clients: Dict[Tuple[str, str, float, bool], object] = {}
+_clients_lock = threading.Lock()
+
+# Absolute time.monotonic() by which every LLM call of the current dish must have finished
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+# Exception class names (Google API, OpenAI and httpx clients) that are worth retrying
+TRANSIENT_ERRORS = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "BadGateway", "GatewayTimeout", "Aborted", "RateLimitError", "APIConnectionError", "APITimeoutError",
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "RemoteProtocolError",
+}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """
+    Raised when the deadline budget of the current dish runs out before an LLM call completes.
+    """
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    """
+    Timeouts, retries and hedging applied to every call made through get_chat_model.
+
+    Attributes:
+        timeout (float): Seconds a single attempt may take.
+        max_retries (int): Retries of transient failures after the first attempt.
+        backoff_base (float): Upper bound in seconds of the first backoff; doubles on every retry.
+        backoff_max (float): Cap of the backoff upper bound.
+        hedge_percentile (float): Send a second, identical request when a call is slower than this
+            percentile of recent latencies. 0 disables hedging.
+        hedge_min_samples (int): Latencies to observe before hedging starts.
+        pool_size (int): Worker threads running synchronous calls.
+    """
+    timeout: float = 30.0
+    max_retries: int = 2
+    backoff_base: float = 0.25
+    backoff_max: float = 4.0
+    hedge_percentile: float = 0.0
+    hedge_min_samples: int = 20
+    pool_size: int = 32
+
+    @classmethod
+    def from_env(cls) -> "LLMSettings":
+        """
+        Reads LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_HEDGE_PERCENTILE,
+        LLM_HEDGE_MIN_SAMPLES and LLM_POOL_SIZE, falling back to the defaults above.
+        """
+        return cls(
+            timeout=float(os.getenv("LLM_TIMEOUT", cls.timeout)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", cls.max_retries)),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", cls.backoff_base)),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", cls.backoff_max)),
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", cls.hedge_percentile)),
+            hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", cls.hedge_min_samples)),
+            pool_size=int(os.getenv("LLM_POOL_SIZE", cls.pool_size)),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full-jitter backoff before retry number attempt (0-based).
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Gives every LLM call made inside the block (including tasks and threads started from it) a shared
+    budget of the given seconds. Nested budgets can only shorten the outer one. None or 0 adds no limit.
+    """
+    if not seconds:
+        yield
+        return
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """
+    Seconds left in the current deadline budget, or None if there is none.
+    """
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def model_identity(model: str) -> str:
+    """
+    The backend and effective model that get_chat_model uses for a model name, e.g.
+    'gemini:gemini-1.5-flash', 'openai:llama3' or 'fake:gemini-1.5-flash'. Cache versions include it,
+    so answers of one backend or model are never served for another.
+    """
+    backend = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+    if backend == "openai":
+        model = os.getenv("LLM_MODEL", model)
+    return f"{backend}:{model}"
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed LLM call is worth retrying: timeouts, connection errors, rate limits and 5xx responses.
+    """
+    if isinstance(error, LLMDeadlineExceeded):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERRORS:
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+
+def _gemini_client(model: str, temperature: float, json_mode: bool, settings: LLMSettings):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # Retries and timeouts are handled by ResilientChatModel
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        timeout=settings.timeout,
+        max_retries=0,
+        model_kwargs={"response_mime_type": "application/json"} if json_mode else {}
+    )
+
+
+def _openai_client(model: str, temperature: float, json_mode: bool, settings: LLMSettings):
+    # Any OpenAI-compatible server, e.g. a local vLLM, llama.cpp or Ollama model or a stub server
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        base_url=os.getenv("LLM_BASE_URL"),
+        api_key=os.getenv("LLM_API_KEY", "not-needed"),
+        model=os.getenv("LLM_MODEL", model),
+        temperature=temperature,
+        timeout=settings.timeout,
+        max_retries=0,
+        model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {}
+    )
+
+
+def _fake_client(model: str, temperature: float, json_mode: bool, settings: LLMSettings):
+    from src.fake_llm import FakeChatModel
+
+    return FakeChatModel(
+        latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", 0)),
+        jitter_ms=float(os.getenv("FAKE_LLM_JITTER_MS", 0)),
+        seed=int(os.getenv("FAKE_LLM_SEED", 0))
+    )
+
+
+_backends: Dict[str, Callable] = {
+    "gemini": _gemini_client,
+    "openai": _openai_client,
+    "fake": _fake_client,
+}
+
+
+def register_backend(name: str, factory: Callable):
+    """
+    Registers an LLM backend selectable with LLM_BACKEND=name.
+
+    Args:
+        name (str): Backend name.
+        factory (Callable): Called as factory(model, temperature, json_mode, settings) and returning a
+            LangChain chat model (anything with invoke/ainvoke).
+    """
+    with _clients_lock:
+        _backends[name.strip().lower()] = factory
+
+
+def get_chat_model(model: str = "gemini-1.5-flash", temperature: float = 0.1, json_mode: bool = True):
+    """
+    Returns a shared chat client for the given settings, creating it on first use.
+
+    LangChain and the backend packages are only imported when the first client is built, so importing
+    the pipeline modules stays cheap, and every step (and every pipeline rebuild) asking for the
+    same settings reuses one client and its connection pool.
+
+    The client is wrapped in a ResilientChatModel that enforces per-attempt timeouts and the current
+    deadline budget, retries transient failures with jittered backoff and optionally hedges slow calls
+    (see LLMSettings). The LLM_BACKEND environment variable selects the implementation: "gemini"
+    (default), "openai" (an OpenAI-compatible server at LLM_BASE_URL, e.g. a local model), "fake"
+    (the deterministic offline stand-in in src/fake_llm.py) or any name added with register_backend.
+
+    Args:
+        model (str): Model name.
+        temperature (float): Sampling temperature.
+        json_mode (bool): Ask the model to respond with application/json.
+
+    Returns:
+        ResilientChatModel: The shared client.
+    """
+    backend = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+    key = (backend, model, temperature, json_mode)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                if backend not in _backends:
+                    raise ValueError(f"Unknown LLM backend '{backend}'")
+                from src.resilient_llm import ResilientChatModel
+
+                settings = LLMSettings.from_env()
+                client = ResilientChatModel(_backends[backend](model, temperature, json_mode, settings), settings)
+                _clients[key] = client
+    return client
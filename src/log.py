@@ -0,0 +1,122 @@
+"""
+Non-blocking logging for the pipeline steps.
+
+Every logger returned by get_logger hands its records to one process-wide queue, and a single
+listener thread formats them and writes them to stderr. A log call on the request path therefore
+only appends the record to the queue; the message is formatted (lazily, from the %-style template
+and its arguments) by the listener.
+
+High-volume lines (one per ingredient or per search) are logged with extra=SAMPLED and only every
+'LOG_SAMPLE_EVERY'-th record of the same message template is kept (default 10, 1 keeps all). Sampled
+lines must use %-style arguments rather than f-strings, so records of one template share a key.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Dict, Optional, Tuple
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Pass as extra= to mark a line that is logged per ingredient or per search
+SAMPLED = {"sampled": True}
+
+_handler: Optional[logging.handlers.QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records unformatted. The standard QueueHandler formats the message in the calling
+    thread so records can cross process boundaries; the queue here never leaves the process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps the first and then every n-th record of each (logger, message template) pair marked with
+    SAMPLED, and every unmarked record.
+    """
+
+    # Bound on the tracked templates, in case a sampled line is logged with an f-string
+    MAX_TEMPLATES = 1024
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(int(every), 1)
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or not getattr(record, "sampled", False):
+            return True
+        key = (record.name, str(record.msg))
+        with self._lock:
+            if len(self._counts) >= self.MAX_TEMPLATES and key not in self._counts:
+                self._counts.clear()
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+def _start_listener(handler: logging.handlers.QueueHandler):
+    global _listener
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # A forked worker (e.g. under gunicorn) inherits the handler but not the listener thread
+    if _handler is not None:
+        _handler.queue = queue.SimpleQueue()
+        _start_listener(_handler)
+
+
+def _stop_listener():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def queue_handler() -> logging.handlers.QueueHandler:
+    """
+    The process-wide queue handler, with its listener thread started on first use.
+    """
+    global _handler
+    if _handler is None:
+        with _lock:
+            if _handler is None:
+                handler = DeferredQueueHandler(queue.SimpleQueue())
+                handler.addFilter(SamplingFilter(int(os.getenv("LOG_SAMPLE_EVERY", 10))))
+                _start_listener(handler)
+                # Flush the queued records on interpreter exit
+                atexit.register(_stop_listener)
+                if hasattr(os, "register_at_fork"):
+                    os.register_at_fork(after_in_child=_restart_after_fork)
+                _handler = handler
+    return _handler
+
+
+def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+    """
+    Returns the named logger at the given level, writing through the shared logging queue.
+
+    Args:
+        name (str): Logger name.
+        level (int): Logger level.
+
+    Returns:
+        logging.Logger: The logger.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if not logger.handlers:
+        logger.addHandler(queue_handler())
+    return logger
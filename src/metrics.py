@@ -0,0 +1,199 @@
+"""
+Minimal in-process metrics (counters and histograms) rendered in the Prometheus text format.
+
+Metrics are enabled unless the METRICS_ENABLED environment variable is set to 0/false/no; when
+disabled every update returns after a single flag check.
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+_registry: List["_Metric"] = []
+
+
+def set_enabled(enabled: bool):
+    global ENABLED
+    ENABLED = enabled
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, optionally split by labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values (e.g. latencies in seconds) over fixed buckets.
+    """
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][position] += 1
+            state[1] += 1
+            state[2] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), count, total)) for key, (counts, count, total) in self._values.items())
+        lines = []
+        for key, (counts, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+def render() -> str:
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+    """
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+STAGE_LATENCY = Histogram(
+    "nutrition_stage_duration_seconds", "Latency of each pipeline stage per request.", ["stage"]
+)
+LLM_CALLS = Counter("nutrition_llm_calls_total", "LLM calls made, by pipeline step.", ["step"])
+LLM_TOKENS = Counter("nutrition_llm_tokens_total", "LLM tokens used, by pipeline step and direction.", ["step", "kind"])
+LLM_ERRORS = Counter("nutrition_llm_errors_total", "Failed LLM calls, by pipeline step.", ["step"])
+LLM_RETRIES = Counter("nutrition_llm_retries_total", "Retried LLM calls, by pipeline step.", ["step"])
+LLM_HEDGES = Counter("nutrition_llm_hedged_requests_total", "Hedged (duplicate) LLM requests, by pipeline step.", ["step"])
+CACHE_LOOKUPS = Counter("nutrition_cache_lookups_total", "Cache lookups, by cache and result (hit/miss; exact/alias/memo/fuzzy for the food resolver).", ["cache", "result"])
+FUZZY_MATCH_MISSES = Counter("nutrition_fuzzy_match_misses_total", "Ingredients without any fuzzy match in the nutrition table.")
+COALESCED_REQUESTS = Counter(
+    "nutrition_coalesced_requests_total", "Requests that shared an in-flight computation for the same dish."
+)
+GRAM_ESTIMATES = Counter("nutrition_gram_estimates_total", "Gram estimates, by source (table/llm).", ["source"])
+
+
+def observe_stages(timings: Dict[str, float]):
+    """
+    Records a request's per-stage timings (in milliseconds, as collected by nutrition_calculator.timed).
+    """
+    if not ENABLED:
+        return
+    for stage, ms in timings.items():
+        STAGE_LATENCY.observe(ms / 1000, stage=stage)
+
+
+def record_llm_response(step: str, response):
+    """
+    Counts one LLM call and, if the response carries usage metadata, its input/output tokens.
+    """
+    if not ENABLED:
+        return
+    LLM_CALLS.inc(step=step)
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), step=step, kind="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), step=step, kind="output")
+
+
+_handler_class = None
+
+
+def llm_config(step: str) -> dict:
+    """
+    Returns the LangChain run config of an LLM call of the given pipeline step: the metrics callbacks
+    and the step name as metadata (used as a label by the resilient LLM layer).
+    """
+    return {"callbacks": llm_callbacks(step), "metadata": {"step": step}}
+
+
+def llm_callbacks(step: str) -> list:
+    """
+    Returns LangChain callbacks that record calls, tokens, errors and retries for a chain run,
+    or an empty list when metrics are disabled. Pass them as config={"callbacks": ...}.
+    """
+    global _handler_class
+    if not ENABLED:
+        return []
+    if _handler_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class MetricsCallbackHandler(BaseCallbackHandler):
+            def __init__(self, step: str):
+                self.step = step
+
+            def on_llm_end(self, response, **kwargs):
+                for generations in response.generations:
+                    for generation in generations[:1]:
+                        record_llm_response(self.step, getattr(generation, "message", None))
+
+            def on_llm_error(self, error, **kwargs):
+                LLM_ERRORS.inc(step=self.step)
+
+            def on_retry(self, retry_state, **kwargs):
+                LLM_RETRIES.inc(step=self.step)
+
+        _handler_class = MetricsCallbackHandler
+    return [_handler_class(step)]
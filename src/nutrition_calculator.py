@@ -1,56 +1,835 @@
 import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
+from src import metrics
+from src.caching import TwoTierCache
+from src.catalog import DishCatalog, compute_entries
 from src.steps.ingredients_extractor import IngredientsExtractor 
 from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+from src.steps.ingredient_resolver import IngredientResolver
 from src.steps.quantity_standardizer import QuantityStandardizer
 from src.steps.quantity_calculator import QuantityCalculator
 from src.steps.dish_categorizer import CategorizeDishes
+from src.singleflight import SingleFlight
+from src.llm import deadline
+from src.log import get_logger
 
 load_dotenv()
 nutrition_file_path = os.getenv('FILE_PATH')
 
-def calculate_nutrition(dish_name: str):
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str):
+    """
+    Adds the wall-clock time (in milliseconds) spent inside the block to timings[stage].
+    Does nothing when timings is None.
+    """
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+class NutritionPipeline:
+    """
+    Long-lived container for the pipeline steps.
+
+    It is built once (e.g. at FastAPI startup) and shared by every request, so the nutrition
+    CSV is read, the Gemini clients are created and the LangChain chain is composed only once.
+    The nutrition data is hot-reloaded when the CSV file changes on disk, and concurrent requests
+    for the same dish are coalesced into one computation.
+    """
+
+    # Bump when the shape of the nutrition result changes, so cached responses are not reused
+    RESULT_FORMAT_VERSION = 4
+
+    def __init__(self, csv_path: str = None, concurrency: int = None, llm_deadline: float = None):
+        """
+        Builds every pipeline step and records how long each one took in startup_timings.
+
+        Args:
+            csv_path (str): Path to the nutrition CSV. Defaults to the 'FILE_PATH' environment variable.
+            concurrency (int): Maximum concurrent per-ingredient tasks in acalculate. Defaults to the
+                'NUTRITION_CONCURRENCY' environment variable, or 8.
+            llm_deadline (float): Seconds all LLM calls of one dish (or one batch chunk) may take together.
+                Defaults to the 'LLM_DEADLINE' environment variable, or 60. 0 disables the budget.
+        """
+        self.logger = get_logger("NutritionPipeline")
+
+        self.csv_path = csv_path or nutrition_file_path
+        self.concurrency = concurrency or int(os.getenv('NUTRITION_CONCURRENCY', 8))
+        self.llm_deadline = float(os.getenv('LLM_DEADLINE', 60)) if llm_deadline is None else llm_deadline
+        self.startup_timings = {}
+
+        with timed(self.startup_timings, "ingredients_extractor"):
+            self.ingredients_extractor = IngredientsExtractor()
+        with timed(self.startup_timings, "nutrition_extractor"):
+            self.nutrition_extractor = NutritionalValueExtractor(self.csv_path)
+        with timed(self.startup_timings, "ingredient_resolver"):
+            self.resolver = IngredientResolver(self.nutrition_extractor)
+        with timed(self.startup_timings, "quantity_standardizer"):
+            self.quantity_standardizer = QuantityStandardizer()
+        with timed(self.startup_timings, "quantity_calculator"):
+            self.quantity_calculator = QuantityCalculator()
+        with timed(self.startup_timings, "categorizer"):
+            self.categorizer = CategorizeDishes()
+
+        self.single_flight = SingleFlight()
+        # Serializes reloads, so concurrent requests noticing a CSV change rebuild the index only once
+        self._reload_lock = threading.RLock()
+        self.result_cache = TwoTierCache.from_env("RESULT_CACHE", ".cache/results.sqlite3")
+        with timed(self.startup_timings, "catalog"):
+            self.catalog = DishCatalog.from_env()
+        self._csv_mtime = self._current_mtime()
+        self.result_version = self._result_version()
+        self.logger.info(f"Pipeline ready: {format_timings(self.startup_timings)}")
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.csv_path)
+        except OSError:
+            return None
+
+    def reload_data(self) -> Dict[str, float]:
+        """
+        Re-reads the nutrition CSV and swaps it into the running steps.
+
+        Returns:
+            Dict[str, float]: Time spent on the reload, in milliseconds.
+        """
+        timings = {}
+        with self._reload_lock, timed(timings, "reload"):
+            self.nutrition_extractor.load_data()
+            self._csv_mtime = self._current_mtime()
+            self.result_version = self._result_version()
+        self.logger.info(f"Nutrition data reloaded: {format_timings(timings)}")
+        return timings
+
+    def _result_version(self) -> str:
+        # Cached responses depend on the nutrition data, the matching settings and aliases, the prompts,
+        # LLM backends and models, the gram tables (part of the steps' cache versions), and the result format
+        source = "|".join([
+            str(self.RESULT_FORMAT_VERSION), str(self.nutrition_extractor.checksum), self.resolver.cache_version,
+            self.ingredients_extractor.cache_version, self.quantity_standardizer.cache_version,
+        ])
+        return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+    def result_key(self, dish_name: str) -> str:
+        """
+        Result cache key of a dish: the current result version and the normalized dish name.
+        """
+        return f"{self.result_version}:{NutritionalValueExtractor.normalize(dish_name)}"
+
+    @staticmethod
+    def make_result(data: dict, ingredients: list, events: List[dict] = None) -> dict:
+        """
+        Serializes a nutrition result once, with a strong ETag derived from the serialized body.
+
+        Args:
+            data (dict): The nutrition result.
+            ingredients (list): The extracted ingredients.
+            events (List[dict]): The 'ingredient' events of the dish (see ingredient_events), replayed
+                when the stored result is streamed.
+
+        Returns:
+            dict: {'body': JSON string of {'data', 'ingredients'}, 'etag': quoted ETag, 'events'}.
+        """
+        body = json.dumps({"data": data, "ingredients": ingredients}, separators=(",", ":"))
+        return {"body": body, "etag": '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32], "events": events or []}
+
+    async def aget_result(self, dish_name: str, timings: Dict[str, float] = None) -> dict:
+        """
+        Returns the serialized nutrition result of a dish from the precomputed dish catalog or the
+        result cache, computing it with acalculate (and caching it) otherwise. Dishes without
+        extracted ingredients and incomplete results (see is_complete) are not cached.
+
+        Args:
+            dish_name (str): The name of the recipe.
+            timings (Dict[str, float]): Optional dict that receives the per-stage latency in milliseconds.
+
+        Returns:
+            dict: {'body', 'etag'} as built by make_result, plus 'cacheable': False for a result without
+            extracted ingredients or an incomplete one, which clients and shared caches must not keep either.
+        """
+        await self.areload_if_changed()
+        entry = await self._alookup_result(dish_name, timings)
+        if entry is None:
+            data, ingredients, events = await self._acalculate_shared(dish_name, timings)
+            entry = await self._astore_result(dish_name, data, ingredients, events)
+            if not self.is_complete(data, ingredients):
+                entry = {**entry, "cacheable": False}
+        return entry
+
+    def _lookup_result(self, dish_name: str, timings: Dict[str, float] = None) -> Optional[dict]:
+        """
+        Returns the serialized result of a dish from the dish catalog or the result cache, or None.
+        """
+        entry = self._lookup_catalog(dish_name, timings)
+        if entry is not None:
+            return entry
+        with timed(timings, "result_cache"):
+            entry = self.result_cache.get(self.result_key(dish_name))
+        metrics.CACHE_LOOKUPS.inc(cache="results", result="miss" if entry is None else "hit")
+        return entry
+
+    async def _alookup_result(self, dish_name: str, timings: Dict[str, float] = None) -> Optional[dict]:
+        # Async variant of _lookup_result; the disk tier of the result cache is read off the event loop
+        entry = self._lookup_catalog(dish_name, timings)
+        if entry is not None:
+            return entry
+        with timed(timings, "result_cache"):
+            entry = await self.result_cache.aget(self.result_key(dish_name))
+        metrics.CACHE_LOOKUPS.inc(cache="results", result="miss" if entry is None else "hit")
+        return entry
+
+    def _lookup_catalog(self, dish_name: str, timings: Dict[str, float] = None) -> Optional[dict]:
+        # The catalog is held in memory, so it is read inline on both paths
+        if not len(self.catalog):
+            return None
+        with timed(timings, "catalog"):
+            entry = self.catalog.get(dish_name, self.result_version)
+        metrics.CACHE_LOOKUPS.inc(cache="catalog", result="miss" if entry is None else "hit")
+        return entry
+
+    @staticmethod
+    def is_complete(data: dict, ingredients: list) -> bool:
+        """
+        Whether a computed result may be cached: ingredients were extracted and every matched
+        ingredient got a weight. Failed gram estimates (e.g. after repeated LLM timeouts) are listed
+        in the result's 'errors' and left out of its totals, so retrying can give a different answer.
+        """
+        return bool(ingredients) and not data.get("incomplete")
+
+    def _store_result(self, dish_name: str, data: dict, ingredients: list, events: List[dict]) -> dict:
+        # Serializes a computed result and caches it, unless it is incomplete
+        entry = self.make_result(data, ingredients, events)
+        if self.is_complete(data, ingredients):
+            self.result_cache.set(self.result_key(dish_name), entry)
+        return entry
+
+    async def _astore_result(self, dish_name: str, data: dict, ingredients: list, events: List[dict]) -> dict:
+        # Async variant of _store_result that writes the disk tier off the event loop
+        entry = self.make_result(data, ingredients, events)
+        if self.is_complete(data, ingredients):
+            await self.result_cache.aset(self.result_key(dish_name), entry)
+        return entry
+
+    def refresh_catalog(self) -> dict:
+        """
+        Recomputes the catalog entries computed for an outdated result version (e.g. after the CSV,
+        a prompt or a model changed) and saves the catalog file.
+
+        With several worker processes only the one holding the catalog's refresh lock recomputes; it
+        first re-reads the file, so dishes another worker already refreshed are not computed again.
+
+        Returns:
+            dict: The number of refreshed dishes and the errors of those that failed, or 'skipped'
+            when another process is refreshing.
+        """
+        with self.catalog.refresh_lock() as acquired:
+            if not acquired:
+                return {"refreshed": 0, "errors": {}, "skipped": True}
+            self.catalog.reload()
+            stale = self.catalog.stale(self.result_version)
+            if not stale:
+                return {"refreshed": 0, "errors": {}}
+            self.logger.info(f"Refreshing {len(stale)} stale catalog dishes")
+            errors = compute_entries(self, self.catalog, stale)
+            if self.catalog.path:
+                self.catalog.save()
+        return {"refreshed": len(stale) - len(errors), "errors": errors}
+
+    def purge_results(self, dish_name: str = None):
+        """
+        Drops the cached result of one dish (for the current data, prompts and models), or all of them.
+        """
+        if dish_name is None:
+            self.result_cache.clear()
+        else:
+            self.result_cache.delete(self.result_key(dish_name))
+        self.logger.info(f"Purged cached results for {repr(dish_name) if dish_name else 'all dishes'}")
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the nutrition data if the CSV modification time changed since the last load.
+
+        Returns:
+            bool: True if the data was reloaded.
+        """
+        if not self._csv_changed():
+            return False
+        with self._reload_lock:
+            # Another request may have reloaded while this one waited for the lock
+            if not self._csv_changed():
+                return False
+            self.reload_data()
+        return True
+
+    async def areload_if_changed(self) -> bool:
+        """
+        Async variant of reload_if_changed; a reload runs in a worker thread, off the event loop.
+        """
+        if not self._csv_changed():
+            return False
+        return await asyncio.to_thread(self.reload_if_changed)
+
+    def _csv_changed(self) -> bool:
+        mtime = self._current_mtime()
+        return mtime is not None and mtime != self._csv_mtime
+
+    def _match_ingredients(self, ingredients: List[dict], matches: dict = None) -> List[tuple]:
+        """
+        Matches all ingredients against the nutrition table: common names by exact/alias lookup,
+        the rest in one vectorized fuzzy pass.
+
+        Args:
+            ingredients (List[dict]): Ingredient dicts with an 'ingredient' key.
+            matches (dict): Optional, precomputed resolve_many result covering these ingredients.
+
+        Returns:
+            List[tuple]: (ingredient dict, best FoodRecord) pairs for the ingredients that matched.
+        """
+        if matches is None:
+            matches = self.resolver.resolve_many([i['ingredient'] for i in ingredients])
+        return [(i, matches[i['ingredient']][0]) for i in ingredients
+                if isinstance(matches[i['ingredient']], list) and matches[i['ingredient']]]
+
+    # Output keys of the nutrient columns, in FoodIndex.NUTRIENT_COLUMNS order
+    OUTPUT_FIELDS = ("protein", "carbs", "fat", "fibre", "energy_kcal", "freesugar")
+    # Columns summed into the dish weight used for categorization
+    MACRO_FIELDS = ("protein", "carbs", "fat", "fibre")
+
+    def _summarize(self, matched: List[tuple], weights: List, timings: Dict[str, float]) -> dict:
+        """
+        Scales the matched nutritional values by the estimated weights, sums them and categorizes the dish.
+        See _summarize_many.
+        """
+        return self._summarize_many([(matched, weights)], timings)[0]
+
+    def _summarize_many(self, dishes: List[tuple], timings: Dict[str, float]) -> List[dict]:
+        """
+        Aggregates the nutrition of one or more dishes in a single vectorized pass and categorizes them.
+        Values are only rounded in the output: totals to whole numbers, per-ingredient values to 0.1.
+        Matched ingredients without a weight are listed in 'errors' and mark the result 'incomplete'.
+
+        Args:
+            dishes (List[tuple]): (matched, weights) per dish, where matched holds (ingredient dict, FoodRecord)
+                pairs and weights the estimated grams (or an error dictionary) for each of them.
+                Ingredients without a numeric weight are left out of the totals.
+            timings (Dict[str, float]): Receives the 'aggregate' and 'categorize' latencies.
+
+        Returns:
+            List[dict]: The nutrition result of each dish, in order.
+        """
+        with timed(timings, "aggregate"):
+            kept = [
+                [(i, best, grams) for (i, best), grams in zip(matched, weights) if isinstance(grams, (int, float))]
+                for matched, weights in dishes
+            ]
+            aggregated = self.quantity_calculator.aggregate_batch([
+                ([grams for _, _, grams in items], [best.nutrients for _, best, _ in items]) for items in kept
+            ])
+
+        with timed(timings, "categorize"):
+            results = []
+            for (matched, weights), items, (per_ingredient, totals) in zip(dishes, kept, aggregated):
+                errors = [
+                    {"ingredient": i['ingredient'], "food_name": best.food_name, "error": self._weight_error(grams)}
+                    for (i, best), grams in zip(matched, weights) if not isinstance(grams, (int, float))
+                ]
+                total = dict(zip(self.OUTPUT_FIELDS, totals.tolist())) if len(totals) else dict.fromkeys(self.OUTPUT_FIELDS, 0.0)
+                results.append({
+                    "estimated_nutrition": [{field: round(value) for field, value in total.items()}],
+                    "ingredient_nutrition": [
+                        self._ingredient_entry(i, best, grams, row) for (i, best, grams), row in zip(items, per_ingredient)
+                    ],
+                    "dish_type": self.categorizer.categorize_dish(sum(total[field] for field in self.MACRO_FIELDS)),
+                    "errors": errors,
+                    "incomplete": bool(errors),
+                })
+            return results
+
+    def ingredient_events(self, ingredients: List[dict], matched: List[tuple], weights: List) -> List[dict]:
+        """
+        The 'ingredient' events a stream of the dish emits (see stream), in the order of matched: one
+        error event per ingredient without match, then one per matched ingredient. Running totals are
+        summed from the unrounded values, like in a computed stream.
+
+        Args:
+            ingredients (List[dict]): The extracted ingredients.
+            matched (List[tuple]): (ingredient dict, FoodRecord) pairs, as returned by _match_ingredients.
+            weights (List): The estimated grams (or an error dictionary) of each matched ingredient.
+
+        Returns:
+            List[dict]: The events.
+        """
+        progress = _StreamProgress(self, None, ingredients, matched)
+        progress.start()
+        for position, grams in enumerate(weights):
+            progress.resolve(position, grams)
+        return progress.events
+
+    @staticmethod
+    def _weight_error(grams) -> str:
+        # Message of a failed gram estimate (an error dictionary, or None if it never resolved)
+        return grams.get("error", "Could not estimate grams") if isinstance(grams, dict) else "Could not estimate grams"
+
+    def _ingredient_entry(self, ingredient: dict, best, grams: float, row) -> dict:
+        # One 'ingredient_nutrition' item: the matched food, its weight and its scaled nutrient values
+        return {
+            "ingredient": ingredient['ingredient'],
+            "food_name": best.food_name,
+            "grams": round(grams, 1),
+            **{field: round(value, 1) for field, value in zip(self.OUTPUT_FIELDS, row.tolist())}
+        }
+
+    def _coalesced(self, timings: Dict[str, float], wait: Dict[str, float], result, shared: bool):
+        # Callers that shared another request's computation only report how long they waited
+        if shared:
+            timings.update(wait)
+            metrics.COALESCED_REQUESTS.inc()
+        return result
+
+    def calculate(self, dish_name: str, timings: Dict[str, float] = None):
+        """
+        Calculates the nutrition of a recipe using the shared pipeline steps.
+
+        Concurrent calls for the same dish (compared by normalized name) share one computation,
+        and its result or error.
+
+        Args:
+            dish_name (str): The name of the recipe.
+            timings (Dict[str, float]): Optional dict that receives the per-stage latency in milliseconds,
+                or the 'coalesced' wait when the result was shared.
+
+        Returns:
+            tuple[dict, list]: The nutrition result and the extracted ingredients.
+        """
+        if timings is None:
+            timings = {}
+        wait = {}
+        with timed(wait, "coalesced"):
+            result, shared = self.single_flight.do(
+                NutritionalValueExtractor.normalize(dish_name), lambda: self._calculate(dish_name, timings)
+            )
+        return self._coalesced(timings, wait, result, shared)
+
+    def _calculate(self, dish_name: str, timings: Dict[str, float]):
+        with timed(timings, "total"), deadline(self.llm_deadline):
+            self.reload_if_changed()
+
+            # Extract the ingredients of the recipe
+            with timed(timings, "extract_ingredients"):
+                results = self.ingredients_extractor.extract_ingredients(dish_name)
+
+            with timed(timings, "search_food"):
+                matched = self._match_ingredients(results)
+
+            # One batched gram estimation for every matched ingredient of the dish
+            with timed(timings, "estimate_grams"):
+                weights = self.quantity_standardizer.estimate_grams_batch(
+                    [(i['ingredient'], i['quantity']) for i, _ in matched]
+                )
+
+            result = self._summarize(matched, weights, timings)
+
+        metrics.observe_stages(timings)
+        self.logger.info("Timings for '%s': %s", dish_name, LazyTimings(timings))
+        return result,results
+
+    async def acalculate(self, dish_name: str, timings: Dict[str, float] = None):
+        """
+        Async variant of calculate.
+
+        LLM calls are awaited with ainvoke, the vectorized fuzzy matching runs in a worker thread
+        so it stays off the event loop, and per-ingredient LLM fallbacks are fanned out with
+        asyncio.gather under the pipeline's concurrency limit. Concurrent requests for the same
+        dish await one shared task.
+
+        Args:
+            dish_name (str): The name of the recipe.
+            timings (Dict[str, float]): Optional dict that receives the per-stage latency in milliseconds,
+                or the 'coalesced' wait when the result was shared.
+
+        Returns:
+            tuple[dict, list]: The nutrition result and the extracted ingredients.
+        """
+        result, ingredients, _ = await self._acalculate_shared(dish_name, timings)
+        return result, ingredients
+
+    async def _acalculate_shared(self, dish_name: str, timings: Dict[str, float] = None):
+        # acalculate, also returning the ingredient events stored with the result
+        if timings is None:
+            timings = {}
+        wait = {}
+        with timed(wait, "coalesced"):
+            result, shared = await self.single_flight.ado(
+                NutritionalValueExtractor.normalize(dish_name), lambda: self._acalculate(dish_name, timings)
+            )
+        return self._coalesced(timings, wait, result, shared)
+
+    async def _acalculate(self, dish_name: str, timings: Dict[str, float]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        with timed(timings, "total"), deadline(self.llm_deadline):
+            await self.areload_if_changed()
+
+            with timed(timings, "extract_ingredients"):
+                results = await self.ingredients_extractor.aextract_ingredients(dish_name)
+
+            with timed(timings, "search_food"):
+                matched = await asyncio.to_thread(self._match_ingredients, results)
+
+            with timed(timings, "estimate_grams"):
+                weights = await self.quantity_standardizer.aestimate_grams_batch(
+                    [(i['ingredient'], i['quantity']) for i, _ in matched],
+                    semaphore
+                )
+
+            result = self._summarize(matched, weights, timings)
+
+        metrics.observe_stages(timings)
+        self.logger.info("Timings for '%s': %s", dish_name, LazyTimings(timings))
+        return result, results, self.ingredient_events(results, matched, weights)
+
+    def stream(self, dish_name: str, timings: Dict[str, float] = None) -> Iterator[dict]:
+        """
+        Iterator form of calculate: yields the progress of the calculation as events, so callers can show
+        the ingredient list after a single LLM call instead of waiting for the whole dish.
+
+        Events are {'event': name, 'data': payload} dicts, in this order:
+            - 'ingredients': {'dish_name', 'ingredients'}, the extracted ingredient list.
+            - 'ingredient': one per ingredient as soon as its weight is known (table hits first, then in
+              the order the LLM answers): the 'ingredient_nutrition' item of the final result plus the
+              running 'totals', or {'ingredient', 'error'} for an ingredient without match or weight.
+            - 'result': the final nutrition result, as returned by calculate, including 'dish_type'.
+
+        A dish found in the dish catalog or the result cache is replayed from the stored result and its
+        stored events (in matched order rather than arrival order); a computed result is stored in the
+        result cache. Streams are not coalesced with other requests.
+
+        Args:
+            dish_name (str): The name of the recipe.
+            timings (Dict[str, float]): Optional dict that receives the per-stage latency in milliseconds.
+
+        Yields:
+            dict: The events described above.
+        """
+        if timings is None:
+            timings = {}
+        self.reload_if_changed()
+        entry = self._lookup_result(dish_name, timings)
+        if entry is not None:
+            yield from self._replay(dish_name, entry)
+            return
+
+        expires = self._stream_deadline()
+        with self._budget(expires), timed(timings, "extract_ingredients"):
+            ingredients = self.ingredients_extractor.extract_ingredients(dish_name)
+        with timed(timings, "search_food"):
+            progress = _StreamProgress(self, dish_name, ingredients)
+        yield from progress.start()
+
+        estimates = self.quantity_standardizer.estimate_grams_stream(progress.items)
+        try:
+            while True:
+                with self._budget(expires), timed(timings, "estimate_grams"):
+                    estimate = next(estimates, None)
+                if estimate is None:
+                    break
+                yield progress.resolve(*estimate)
+        finally:
+            estimates.close()
+        result = self._finish_stream(progress, timings)
+        self._store_result(dish_name, result, progress.ingredients, progress.events)
+        yield {"event": "result", "data": result}
+
+    async def astream(self, dish_name: str, timings: Dict[str, float] = None) -> AsyncIterator[dict]:
+        """
+        Async variant of stream. Batched gram estimates and their single-item fallbacks run concurrently
+        under the pipeline's concurrency limit, and every ingredient is yielded as soon as it resolves.
+        """
+        if timings is None:
+            timings = {}
+        await self.areload_if_changed()
+        entry = await self._alookup_result(dish_name, timings)
+        if entry is not None:
+            for event in self._replay(dish_name, entry):
+                yield event
+            return
+
+        expires = self._stream_deadline()
+        with self._budget(expires), timed(timings, "extract_ingredients"):
+            ingredients = await self.ingredients_extractor.aextract_ingredients(dish_name)
+        with timed(timings, "search_food"):
+            progress = await asyncio.to_thread(_StreamProgress, self, dish_name, ingredients)
+        for event in progress.start():
+            yield event
+
+        estimates = self.quantity_standardizer.aestimate_grams_stream(
+            progress.items, asyncio.Semaphore(self.concurrency)
+        )
+        try:
+            while True:
+                with self._budget(expires), timed(timings, "estimate_grams"):
+                    try:
+                        estimate = await estimates.__anext__()
+                    except StopAsyncIteration:
+                        break
+                yield progress.resolve(*estimate)
+        finally:
+            await estimates.aclose()
+        result = self._finish_stream(progress, timings)
+        await self._astore_result(dish_name, result, progress.ingredients, progress.events)
+        yield {"event": "result", "data": result}
+
+    def _stream_deadline(self) -> Optional[float]:
+        return time.monotonic() + self.llm_deadline if self.llm_deadline else None
+
+    @staticmethod
+    def _budget(expires: Optional[float]):
+        # The deadline budget of a stream is re-entered around every step, so it never spans a yield
+        # (the consumer may resume the generator from another thread or context)
+        return deadline(None if expires is None else max(expires - time.monotonic(), 1e-3))
+
+    def _finish_stream(self, progress: "_StreamProgress", timings: Dict[str, float]) -> dict:
+        # The final result of a stream; the caller stores it with _store_result or _astore_result
+        result = progress.finish(timings)
+        metrics.observe_stages(timings)
+        self.logger.info("Timings for streamed '%s': %s", progress.dish_name, LazyTimings(timings))
+        return result
+
+    def _replay(self, dish_name: str, entry: dict) -> Iterator[dict]:
+        # Emits the events of a stored result, with the same shape as a computed stream
+        body = json.loads(entry["body"])
+        yield {"event": "ingredients", "data": {"dish_name": dish_name, "ingredients": body["ingredients"]}}
+        yield from entry.get("events", [])
+        yield {"event": "result", "data": body["data"]}
+
+    def calculate_batch(self, dish_names: List[str], chunk_size: int = 20, with_events: bool = False) -> Iterator[dict]:
+        """
+        Calculates the nutrition of many recipes, yielding one result per distinct dish.
+
+        Dish names are deduplicated by normalized name and processed in chunks. For each chunk the
+        ingredient extraction runs as one chain batch, all ingredients are matched against the
+        nutrition table in one pass and grams are estimated with one batched LLM call; the dishes
+        of a chunk are yielded as soon as the chunk completes. A failing dish is reported inline
+        with an 'error' key and does not abort the batch: if a chunk raises, its dishes are retried
+        one by one, so only the dishes that fail on their own are reported as errors.
+
+        Args:
+            dish_names (List[str]): The names of the recipes.
+            chunk_size (int): Number of distinct dishes processed together.
+            with_events (bool): Also return the 'events' of each calculated dish (see ingredient_events),
+                e.g. to store them with make_result.
+
+        Yields:
+            dict: {'dish_name', 'data', 'ingredients'} (and 'events') for a calculated dish or
+            {'dish_name', 'error'} for a failed one.
+        """
+        self.reload_if_changed()
+        unique = {}
+        for name in dish_names:
+            unique.setdefault(NutritionalValueExtractor.normalize(name), name)
+        unique = list(unique.values())
+        self.logger.info(f"Calculating nutrition for {len(unique)} distinct dishes ({len(dish_names)} requested)")
+        for start in range(0, len(unique), chunk_size):
+            for entry in self._calculate_dishes(unique[start:start + chunk_size]):
+                if not with_events:
+                    entry.pop("events", None)
+                yield entry
+
+    def _calculate_dishes(self, dish_names: List[str]) -> List[dict]:
+        # Calculates a chunk under one deadline budget, falling back to one dish (and budget) at a time
+        try:
+            with deadline(self.llm_deadline):
+                return self._calculate_chunk(dish_names)
+        except Exception as e:
+            if len(dish_names) == 1:
+                self.logger.error(f"Batch dish '{dish_names[0]}' failed: {e}")
+                return [{"dish_name": dish_names[0], "error": str(e)}]
+            self.logger.warning(f"Batch chunk failed ({e}), calculating its {len(dish_names)} dishes one by one")
+            return [entry for name in dish_names for entry in self._calculate_dishes([name])]
+
+    def _calculate_chunk(self, dish_names: List[str]) -> List[dict]:
+        ingredient_lists = self.ingredients_extractor.extract_ingredients_batch(dish_names, self.concurrency)
+
+        valid = {}
+        errors = {}
+        for name, ingredients in zip(dish_names, ingredient_lists):
+            if not ingredients:
+                errors[name] = "Could not extract ingredients"
+            else:
+                valid[name] = ingredients
+
+        # Match the union of all ingredients of the chunk in one vectorized pass
+        matches = self.resolver.resolve_many(
+            [i['ingredient'] for ingredients in valid.values() for i in ingredients]
+        )
+        matched = {name: self._match_ingredients(ingredients, matches) for name, ingredients in valid.items()}
+
+        # One batched gram estimation for the distinct (ingredient, quantity) pairs of the chunk
+        pairs = list(dict.fromkeys(
+            (i['ingredient'], i['quantity']) for dish_matches in matched.values() for i, _ in dish_matches
+        ))
+        weight_of = dict(zip(pairs, self.quantity_standardizer.estimate_grams_batch(pairs)))
+
+        # Aggregate every dish of the chunk in one vectorized pass
+        weights = {
+            name: [weight_of[(i['ingredient'], i['quantity'])] for i, _ in dish_matches]
+            for name, dish_matches in matched.items()
+        }
+        summaries = dict(zip(matched, self._summarize_many(
+            [(matched[name], weights[name]) for name in matched], {}
+        )))
+
+        entries = []
+        for name in dish_names:
+            if name in errors:
+                entries.append({"dish_name": name, "error": errors[name]})
+            else:
+                entries.append({
+                    "dish_name": name, "data": summaries[name], "ingredients": valid[name],
+                    "events": self.ingredient_events(valid[name], matched[name], weights[name]),
+                })
+        return entries
+
+
+class _StreamProgress:
+    """
+    State of one streamed dish (see NutritionPipeline.stream): the matched ingredients, the weights
+    resolved so far and the running totals, turned into events as the weights come in.
+    """
+
+    def __init__(self, pipeline: NutritionPipeline, dish_name: str, ingredients: List[dict], matched: List[tuple] = None):
+        self.pipeline = pipeline
+        self.dish_name = dish_name
+        self.ingredients = ingredients
+        self.matched = pipeline._match_ingredients(ingredients) if matched is None else matched
+        self.weights = [None] * len(self.matched)
+        self.totals = [0.0] * len(pipeline.OUTPUT_FIELDS)
+        # The 'ingredient' events emitted so far, stored with the result for replays
+        self.events = []
+
+    @property
+    def items(self) -> List[tuple]:
+        # (ingredient, quantity) pairs to estimate, in the order of matched
+        return [(i['ingredient'], i['quantity']) for i, _ in self.matched]
+
+    def start(self) -> List[dict]:
+        matched = {id(i) for i, _ in self.matched}
+        events = [{"event": "ingredients", "data": {"dish_name": self.dish_name, "ingredients": self.ingredients}}]
+        self.events = [
+            {"event": "ingredient", "data": {"ingredient": i['ingredient'], "error": "No matching food in the nutrition table"}}
+            for i in self.ingredients if id(i) not in matched
+        ]
+        return events + self.events
+
+    def resolve(self, position: int, grams) -> dict:
+        event = self._resolve(position, grams)
+        self.events.append(event)
+        return event
+
+    def _resolve(self, position: int, grams) -> dict:
+        self.weights[position] = grams
+        ingredient, best = self.matched[position]
+        if not isinstance(grams, (int, float)):
+            error = self.pipeline._weight_error(grams)
+            return {"event": "ingredient", "data": {"ingredient": ingredient['ingredient'], "food_name": best.food_name, "error": error}}
+
+        per_ingredient, totals = self.pipeline.quantity_calculator.aggregate([grams], [best.nutrients])
+        self.totals = [total + value for total, value in zip(self.totals, totals.tolist())]
+        return {"event": "ingredient", "data": {
+            **self.pipeline._ingredient_entry(ingredient, best, grams, per_ingredient[0]),
+            "totals": {field: round(value) for field, value in zip(self.pipeline.OUTPUT_FIELDS, self.totals)}
+        }}
+
+    def finish(self, timings: Dict[str, float]) -> dict:
+        return self.pipeline._summarize(self.matched, self.weights, timings)
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """
+    Formats a timings dict as 'stage=12.3ms, ...' for log lines.
+    """
+    return ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in timings.items())
+
+
+class LazyTimings:
+    """
+    Log argument that formats a copy of a timings dict only when the log line is emitted.
+    """
+
+    def __init__(self, timings: Dict[str, float]):
+        self.timings = dict(timings)
+
+    def __str__(self) -> str:
+        return format_timings(self.timings)
+
+
+_default_pipeline = None
+
+
+def get_pipeline() -> NutritionPipeline:
+    """
+    Returns the process-wide pipeline, building it on first use.
+    """
+    global _default_pipeline
+    if _default_pipeline is None:
+        _default_pipeline = NutritionPipeline()
+    return _default_pipeline
+
+
+def calculate_nutrition(dish_name: str, pipeline: NutritionPipeline = None):
     '''
     This function is used to calculate the nutrition of a recipe.
     It takes the recipe name as input and returns the nutrition information.
+    The shared process-wide pipeline is used unless one is passed in.
+    '''
+    pipeline = pipeline or get_pipeline()
+    return pipeline.calculate(dish_name)
+
+
+async def acalculate_nutrition(dish_name: str, pipeline: NutritionPipeline = None):
+    '''
+    Async variant of calculate_nutrition.
+    The shared process-wide pipeline is used unless one is passed in.
+    '''
+    pipeline = pipeline or get_pipeline()
+    return await pipeline.acalculate(dish_name)
+
+
+def calculate_nutrition_batch(dish_names: List[str], pipeline: NutritionPipeline = None) -> Iterator[dict]:
+    '''
+    Calculates the nutrition of many recipes, yielding one result per distinct dish as it completes.
+    See NutritionPipeline.calculate_batch.
+    '''
+    pipeline = pipeline or get_pipeline()
+    return pipeline.calculate_batch(dish_names)
+
+
+def calculate_nutrition_stream(dish_name: str, pipeline: NutritionPipeline = None) -> Iterator[dict]:
+    '''
+    Iterator form of calculate_nutrition: yields the ingredient list, then each ingredient as it resolves,
+    then the final result. See NutritionPipeline.stream.
+    '''
+    pipeline = pipeline or get_pipeline()
+    return pipeline.stream(dish_name)
+
+
+def acalculate_nutrition_stream(dish_name: str, pipeline: NutritionPipeline = None) -> AsyncIterator[dict]:
+    '''
+    Async variant of calculate_nutrition_stream. See NutritionPipeline.astream.
     '''
-    # Extract the ingredients of the recipe
-    results =IngredientsExtractor().extract_ingredients(dish_name)
-    
-    nutrition_extractor = NutritionalValueExtractor(nutrition_file_path)
-    quantity_standardizer = QuantityStandardizer()
-    quantity_calculator = QuantityCalculator()
-    categorizer = CategorizeDishes()
-
-    result = []
-    res = []
-    sum = 0
-    total_protein_in_grams = 0
-    total_carbohydrates_in_grams = 0
-    total_fat_in_grams = 0
-    total_fibre_in_grams = 0
-
-    for i in results:
-        extractor = nutrition_extractor.search_food(i['ingredient'])
-        res = []
-        s = 0
-        if isinstance(extractor, list) and len(extractor) > 0:
-            weight_in_grams = quantity_standardizer.estimate_grams(i['ingredient'], i['quantity'])
-            res.append(extractor[0]['Protein (g)'])
-            res.append(extractor[0]['Carbohydrates (g)'])
-            res.append(extractor[0]['Fat (g)'])
-            res.append(extractor[0]['Fibre (g)'])
-
-            ans,nutritional_sum = quantity_calculator.calculate_total_nutrition(weight_in_grams,res)
-            total_protein_in_grams = int(total_protein_in_grams + ans[0])
-            total_carbohydrates_in_grams = int(total_carbohydrates_in_grams + ans[1])
-            total_fat_in_grams = int(total_fat_in_grams + ans[2])
-            total_fibre_in_grams = int(total_fibre_in_grams + ans[3])
-            sum = sum + nutritional_sum
-
-    result = {
-        "estimated_nutrition": [{"protein":total_protein_in_grams,"carbs": total_carbohydrates_in_grams,"fat": total_fat_in_grams,"fibre":total_fibre_in_grams}],
-        "dish_type": categorizer.categorize_dish(sum)
-    }
-    return result,results
-    
\ No newline at end of file
+    pipeline = pipeline or get_pipeline()
+    return pipeline.astream(dish_name)
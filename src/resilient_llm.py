@@ -0,0 +1,197 @@
+"""
+Timeouts, deadline budgets, retries with jittered backoff and hedged requests around a LangChain chat model.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+from langchain_core.runnables import Runnable
+from src import metrics
+from src.llm import LLMDeadlineExceeded, LLMSettings, is_transient, remaining_budget
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(size: int) -> ThreadPoolExecutor:
+    # One pool for the synchronous calls of every client
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="llm")
+    return _executor
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent successful call latencies, used to decide when to hedge.
+    """
+
+    def __init__(self, size: int = 256):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int) -> Optional[float]:
+        """
+        Returns the given percentile (0-100) of the window, or None with fewer than min_samples latencies.
+        """
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+class ResilientChatModel(Runnable):
+    """
+    Wraps a chat model so every call honours the per-attempt timeout and the current deadline budget
+    (src.llm.deadline), retries transient failures with full-jitter backoff and, once enough latencies
+    were observed, sends a second identical request when the first is slower than the configured
+    percentile, returning whichever answers first.
+
+    It is a LangChain Runnable, so it composes into chains like the wrapped model and passes the call
+    config (callbacks, metadata) through. The metrics 'step' label is read from config["metadata"]["step"].
+    """
+
+    def __init__(self, client, settings: LLMSettings = None):
+        """
+        Args:
+            client: The wrapped chat model (anything with invoke/ainvoke).
+            settings (LLMSettings): Timeouts, retries and hedging. Defaults to LLMSettings.from_env().
+        """
+        self.client = client
+        self.settings = settings or LLMSettings.from_env()
+        self.latencies = LatencyTracker()
+
+    @staticmethod
+    def _step(config) -> str:
+        return ((config or {}).get("metadata") or {}).get("step", "llm")
+
+    def _attempt_timeout(self) -> tuple:
+        """
+        Returns the timeout of the next attempt and whether it is bound by the deadline budget.
+        """
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise LLMDeadlineExceeded("LLM deadline budget exhausted")
+        if remaining is not None and remaining < self.settings.timeout:
+            return remaining, True
+        return self.settings.timeout, False
+
+    def _timeout_error(self, timeout: float, by_deadline: bool) -> TimeoutError:
+        if by_deadline:
+            return LLMDeadlineExceeded("LLM deadline budget exhausted")
+        return TimeoutError(f"LLM call did not complete within {timeout:.1f}s")
+
+    def _hedge_after(self, timeout: float) -> Optional[float]:
+        if not self.settings.hedge_percentile:
+            return None
+        delay = self.latencies.percentile(self.settings.hedge_percentile, self.settings.hedge_min_samples)
+        return delay if delay is not None and delay < timeout else None
+
+    def _should_retry(self, error: Exception, attempt: int, step: str) -> Optional[float]:
+        """
+        Returns the backoff before retrying the failed attempt, or None to give up.
+        """
+        if attempt >= self.settings.max_retries or not is_transient(error):
+            return None
+        delay = self.settings.backoff(attempt)
+        remaining = remaining_budget()
+        if remaining is not None and delay >= remaining:
+            return None
+        metrics.LLM_RETRIES.inc(step=step)
+        return delay
+
+    def invoke(self, input, config=None, **kwargs):
+        step = self._step(config)
+        attempt = 0
+        while True:
+            try:
+                return self._call(input, config, kwargs, step)
+            except Exception as e:
+                delay = self._should_retry(e, attempt, step)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        step = self._step(config)
+        attempt = 0
+        while True:
+            try:
+                return await self._acall(input, config, kwargs, step)
+            except Exception as e:
+                delay = self._should_retry(e, attempt, step)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _call(self, input, config, kwargs: dict, step: str):
+        timeout, by_deadline = self._attempt_timeout()
+        executor = _get_executor(self.settings.pool_size)
+        start = time.monotonic()
+
+        def submit():
+            # Worker threads see the caller's context (deadline budget, tracing)
+            return executor.submit(contextvars.copy_context().run, self.client.invoke, input, config, **kwargs)
+
+        pending = {submit()}
+        hedge_after = self._hedge_after(timeout)
+        if hedge_after is not None:
+            done, _ = wait(pending, timeout=hedge_after)
+            if not done:
+                metrics.LLM_HEDGES.inc(step=step)
+                pending.add(submit())
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - start)),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                # Abandoned calls finish in the background; their results are dropped
+                raise self._timeout_error(timeout, by_deadline)
+            for future in done:
+                if future.exception() is None:
+                    self.latencies.record(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _acall(self, input, config, kwargs: dict, step: str):
+        timeout, by_deadline = self._attempt_timeout()
+        start = time.monotonic()
+        pending = {asyncio.ensure_future(self.client.ainvoke(input, config, **kwargs))}
+        try:
+            hedge_after = self._hedge_after(timeout)
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    metrics.LLM_HEDGES.inc(step=step)
+                    pending.add(asyncio.ensure_future(self.client.ainvoke(input, config, **kwargs)))
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, timeout - (time.monotonic() - start)), return_when=FIRST_COMPLETED
+                )
+                if not done:
+                    raise self._timeout_error(timeout, by_deadline)
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.record(time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,190 @@
+"""
+Publishes the food index into shared memory once, so the workers of a multi-process deployment
+attach the pre-normalized arrays instead of each loading its own copy of the nutrition data.
+
+The master process (see gunicorn.conf.py) publishes the index before forking the workers and
+exports the segment name in 'NUTRITION_SHM_NAME'. NutritionalValueExtractor.load_data attaches to
+that segment when it was built from the current CSV, and falls back to the snapshot or the CSV
+otherwise (e.g. after the CSV changed on disk).
+
+Segment layout: the byte length of the JSON header (8 bytes, little endian), the header (format,
+CSV checksum, rows, columns and the sizes of the name blocks), then, each aligned to 8 bytes, the
+float64 nutrient matrix, the int64 end offsets of the food names and of the normalized names, and
+the UTF-8 bytes of both name lists.
+"""
+import json
+import sys
+import threading
+import numpy as np
+from collections.abc import Sequence
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+from src.steps.nutritional_value_extractor import FoodIndex, NutritionalValueExtractor
+
+SHARED_FORMAT = 1
+_LENGTH_BYTES = 8
+
+# Segments attached by this process, kept open for its lifetime since FoodIndex arrays point into them
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+_attached_lock = threading.Lock()
+_tracker_lock = threading.Lock()
+
+
+class SharedStrings(Sequence):
+    """
+    Read-only list of strings stored as UTF-8 bytes and end offsets, decoded on access.
+    """
+
+    def __init__(self, data: np.ndarray, ends: np.ndarray):
+        """
+        Args:
+            data (np.ndarray): uint8 array with the concatenated UTF-8 encoded strings.
+            ends (np.ndarray): int64 array with the end offset of every string in data.
+        """
+        self.data = data
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("SharedStrings index out of range")
+        start = int(self.ends[position - 1]) if position else 0
+        return self.data[start:int(self.ends[position])].tobytes().decode("utf-8")
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _encode(names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [name.encode("utf-8") for name in names]
+    ends = np.cumsum([len(name) for name in encoded], dtype=np.int64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), ends
+
+
+def publish(index: FoodIndex, checksum: str, name: str = None) -> shared_memory.SharedMemory:
+    """
+    Copies a food index into a new shared memory segment.
+
+    Args:
+        index (FoodIndex): The index to publish.
+        checksum (str): Checksum of the CSV the index was built from.
+        name (str): Segment name. Defaults to a random name.
+
+    Returns:
+        shared_memory.SharedMemory: The segment. The caller owns it and removes it with release.
+    """
+    food_bytes, food_ends = _encode(list(index.food_names))
+    normalized_bytes, normalized_ends = _encode(list(index.normalized_names))
+    header = json.dumps({
+        "format": SHARED_FORMAT, "checksum": checksum, "rows": len(index),
+        "columns": list(FoodIndex.NUTRIENT_COLUMNS),
+        "food_bytes": len(food_bytes), "normalized_bytes": len(normalized_bytes),
+    }).encode()
+    sections = [np.asarray(index.nutrients), food_ends, normalized_ends, food_bytes, normalized_bytes]
+
+    offset = _align(_LENGTH_BYTES + len(header))
+    size = offset + sum(_align(section.nbytes) for section in sections)
+    segment = _segment(name=name, create=True, size=size)
+    segment.buf[:_LENGTH_BYTES] = len(header).to_bytes(_LENGTH_BYTES, "little")
+    segment.buf[_LENGTH_BYTES:_LENGTH_BYTES + len(header)] = header
+    for section in sections:
+        np.ndarray(section.shape, section.dtype, buffer=segment.buf, offset=offset)[...] = section
+        offset += _align(section.nbytes)
+    return segment
+
+
+def publish_csv(csv_path: str, snapshot_dir: str = None) -> shared_memory.SharedMemory:
+    """
+    Loads the food index of a CSV (from its snapshot when current) and publishes it. See publish.
+    """
+    extractor = NutritionalValueExtractor(csv_path, snapshot_dir=snapshot_dir, matcher="fuzzy")
+    return publish(extractor.index, extractor.checksum)
+
+
+def release(segment: shared_memory.SharedMemory):
+    """
+    Closes and removes a segment created by publish. Processes that already attached it keep their mapping.
+    """
+    segment.close()
+    with _untracked():
+        segment.unlink()
+
+
+@contextmanager
+def _untracked():
+    # The publishing process owns the segments and removes them with release. Before 3.13 every
+    # SharedMemory registers with the multiprocessing resource tracker (shared by forked workers),
+    # which would remove a segment as soon as any process using it exits.
+    from multiprocessing import resource_tracker
+
+    with _tracker_lock:
+        register, unregister = resource_tracker.register, resource_tracker.unregister
+        resource_tracker.register = resource_tracker.unregister = lambda name, rtype: None
+        try:
+            yield
+        finally:
+            resource_tracker.register, resource_tracker.unregister = register, unregister
+
+
+def _segment(**kwargs) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(track=False, **kwargs)
+    with _untracked():
+        return shared_memory.SharedMemory(**kwargs)
+
+
+def attach(name: str, checksum: str = None) -> Optional[FoodIndex]:
+    """
+    Maps a segment written by publish into a FoodIndex without copying the nutrient matrix. The
+    arrays are read-only; only the normalized names are decoded into a list, for rapidfuzz.
+
+    Args:
+        name (str): Segment name.
+        checksum (str): Checksum of the current CSV. None accepts any segment.
+
+    Returns:
+        FoodIndex: The index, or None if the segment does not exist, is in another format or was
+        published from a different CSV.
+    """
+    with _attached_lock:
+        segment = _attached.get(name)
+        if segment is None:
+            try:
+                segment = _segment(name=name)
+            except (OSError, ValueError):
+                return None
+            _attached[name] = segment
+
+    length = int.from_bytes(segment.buf[:_LENGTH_BYTES], "little")
+    try:
+        header = json.loads(bytes(segment.buf[_LENGTH_BYTES:_LENGTH_BYTES + length]))
+    except ValueError:
+        return None
+    if (header.get("format") != SHARED_FORMAT or header.get("columns") != list(FoodIndex.NUTRIENT_COLUMNS)
+            or (checksum is not None and header.get("checksum") != checksum)):
+        return None
+
+    offset = _align(_LENGTH_BYTES + length)
+    rows = header["rows"]
+    sections = []
+    for shape, dtype in (((rows, len(FoodIndex.NUTRIENT_COLUMNS)), np.float64), ((rows,), np.int64),
+                         ((rows,), np.int64), ((header["food_bytes"],), np.uint8),
+                         ((header["normalized_bytes"],), np.uint8)):
+        array = np.ndarray(shape, dtype, buffer=segment.buf, offset=offset)
+        array.flags.writeable = False
+        sections.append(array)
+        offset += _align(array.nbytes)
+    nutrients, food_ends, normalized_ends, food_bytes, normalized_bytes = sections
+    return FoodIndex(
+        SharedStrings(food_bytes, food_ends),
+        list(SharedStrings(normalized_bytes, normalized_ends)),
+        nutrients,
+    )
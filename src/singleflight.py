@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """
+    A computation in flight in a worker thread, with the callers waiting on it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one shared computation.
+
+    While a computation for a key is running, further callers with that key wait for it and receive
+    the same result, or the same exception, instead of starting their own. Nothing is kept once the
+    computation finishes: the next call for the key starts a new one (caching is the callers' job).
+    The thread-based `do` and the asyncio-based `ado` keep separate registries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Runs function() unless a call with the same key is already running in another thread,
+        in which case waits for that call instead.
+
+        Args:
+            key (Hashable): Identifies equivalent calls.
+            function (Callable): Computes the result.
+
+        Returns:
+            tuple: The result, and whether it was shared from another caller's computation.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Async variant of do: awaits the task already computing the key, or starts one with function().
+
+        The shared task is shielded, so a caller that is cancelled (e.g. a disconnected client)
+        does not cancel the computation the other callers are waiting for.
+
+        Args:
+            key (Hashable): Identifies equivalent calls.
+            function (Callable): Returns the coroutine computing the result.
+
+        Returns:
+            tuple: The result, and whether it was shared from another caller's computation.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        shared = task is not None and task.get_loop() is loop
+        if shared:
+            self.coalesced += 1
+        else:
+            task = loop.create_task(function())
+            self._tasks[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the error as retrieved even if every waiter was cancelled
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls) + len(self._tasks),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,47 @@
+"""
+Compiles the nutrition CSV into the binary food index snapshot loaded by NutritionalValueExtractor.
+
+Usage:
+    python -m src.snapshot [path/to/nutrition.csv] [snapshot_dir]
+
+The CSV path defaults to the 'FILE_PATH' environment variable and the snapshot directory to
+NutritionalValueExtractor.default_snapshot_dir. Running this at image build time means cold
+workers load the snapshot instead of parsing and normalizing the CSV; a stale snapshot is
+rebuilt automatically at load time anyway.
+"""
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+
+def build_snapshot(csv_path: str, snapshot_dir: str = None) -> str:
+    """
+    Reads and normalizes the CSV and writes its snapshot, regardless of any existing one.
+
+    Args:
+        csv_path (str): Path to the nutrition CSV.
+        snapshot_dir (str): Output directory. Defaults to NutritionalValueExtractor.default_snapshot_dir.
+
+    Returns:
+        str: The snapshot directory.
+    """
+    snapshot_dir = snapshot_dir or NutritionalValueExtractor.default_snapshot_dir(csv_path)
+    extractor = NutritionalValueExtractor(csv_path, snapshot_dir="")
+    extractor.index.save(snapshot_dir, extractor.checksum)
+    return snapshot_dir
+
+
+def main(argv):
+    load_dotenv()
+    csv_path = argv[0] if argv else os.getenv('FILE_PATH')
+    if not csv_path:
+        sys.exit("usage: python -m src.snapshot [path/to/nutrition.csv] [snapshot_dir]")
+    start = time.perf_counter()
+    snapshot_dir = build_snapshot(csv_path, argv[1] if len(argv) > 1 else None)
+    print(f"Wrote snapshot of {csv_path} to {snapshot_dir} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
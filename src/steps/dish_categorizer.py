@@ -1,4 +1,4 @@
-import logging
+from src.log import get_logger
 
 class CategorizeDishes:
     """
@@ -11,14 +11,7 @@ class CategorizeDishes:
         """
         Initializes the CategorizeDishes class by setting up the logger to track categorization events.
         """
-        self.logger = logging.getLogger("Categorize Dishes")
-        self.logger.setLevel(logging.INFO)
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        ch.setFormatter(formatter)
-        if not self.logger.handlers:
-            self.logger.addHandler(ch)
+        self.logger = get_logger("Categorize Dishes")
 
     def categorize_dish(self, weight: float) -> str:
         """
@@ -58,5 +51,5 @@ class CategorizeDishes:
             return None
 
         # Log and return the category
-        self.logger.info(f"Weight {weight}g/ml categorized as: {category}")
+        self.logger.info("Weight %sg/ml categorized as: %s", weight, category)
         return category
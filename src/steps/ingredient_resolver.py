@@ -0,0 +1,243 @@
+import hashlib
+import json
+import threading
+from typing import Dict, List, Union
+from src import metrics
+from src.caching import LRUCache
+from src.log import get_logger
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor, FoodIndex, FoodRecord
+
+# Common ingredient names (and Hindi / regional synonyms) mapped to the normalized name of their food table row
+DEFAULT_ALIASES = {
+    "onion": "onion big allium cepa",
+    "onions": "onion big allium cepa",
+    "pyaz": "onion big allium cepa",
+    "tomato": "tomato ripe local solanum lycopersicum",
+    "tomatoes": "tomato ripe local solanum lycopersicum",
+    "oil": "cooking oil groundnut gingerly palmolein mustard coconut etc",
+    "cooking oil": "cooking oil groundnut gingerly palmolein mustard coconut etc",
+    "vegetable oil": "cooking oil groundnut gingerly palmolein mustard coconut etc",
+    "mustard oil": "oil mustard",
+    "coconut oil": "oil coconut",
+    "turmeric": "turmeric powder curcuma domestica",
+    "turmeric powder": "turmeric powder curcuma domestica",
+    "haldi": "turmeric powder curcuma domestica",
+    "red chili powder": "chilli powder",
+    "red chilli powder": "chilli powder",
+    "chili powder": "chilli powder",
+    "kashmiri red chilli powder": "chilli powder",
+    "green chili": "chillies green all varieties capsicum annum",
+    "green chilli": "chillies green all varieties capsicum annum",
+    "green chilies": "chillies green all varieties capsicum annum",
+    "green chillies": "chillies green all varieties capsicum annum",
+    "dried red chilli": "chillies red capsicum annum",
+    "dried red chillies": "chillies red capsicum annum",
+    "ginger": "ginger fresh zingiber officinale",
+    "garlic": "garlic big clove allium sativum",
+    "garlic cloves": "garlic big clove allium sativum",
+    "curd": "curds cows milk",
+    "dahi": "curds cows milk",
+    "yogurt": "yogurt whole milk plain",
+    "yoghurt": "yogurt whole milk plain",
+    "jeera": "cumin seeds cuminum cyminum",
+    "cumin": "cumin seeds cuminum cyminum",
+    "cumin seeds": "cumin seeds cuminum cyminum",
+    "cumin powder": "cumin seeds cuminum cyminum",
+    "coriander leaves": "coriander leaves coriandrum sativum",
+    "cilantro": "coriander leaves coriandrum sativum",
+    "chopped cilantro": "coriander leaves coriandrum sativum",
+    "dhania": "coriander leaves coriandrum sativum",
+    "coriander powder": "coriander seeds coriandrum sativum",
+    "dhania powder": "coriander seeds coriandrum sativum",
+    "sugar": "sugar white",
+    "ghee": "ghee cow",
+    "milk": "milk whole cow",
+    "fresh cream": "cream fresh single",
+    "cream": "cream fresh single",
+    "potato": "potato brown skin big solanum tuberosum",
+    "potatoes": "potato brown skin big solanum tuberosum",
+    "aloo": "potato brown skin big solanum tuberosum",
+    "rice": "rice raw milled oryza sativa",
+    "basmati rice": "rice raw milled oryza sativa",
+    "atta": "wheat flour atta triticum aestivum",
+    "wheat flour": "wheat flour atta triticum aestivum",
+    "maida": "wheat flour refined triticum aestivum",
+    "besan": "flour gram",
+    "gram flour": "flour gram",
+    "rava": "wheat semolina triticum aestivum",
+    "sooji": "wheat semolina triticum aestivum",
+    "semolina": "wheat semolina triticum aestivum",
+    "toor dal": "red gram dal cajanus cajan",
+    "arhar dal": "red gram dal cajanus cajan",
+    "moong dal": "green gram dal vigna radiata",
+    "urad dal": "black gram dal phaseolus mungo",
+    "chana dal": "bengal gram dal cicer arietinum",
+    "masoor dal": "lentil dal lens culinaris",
+    "chickpeas": "chickpeas garbanzo beans bengal gram mature seeds raw",
+    "kabuli chana": "chickpeas garbanzo beans bengal gram mature seeds raw",
+    "green peas": "peas fresh pisum sativum",
+    "peas": "peas fresh pisum sativum",
+    "cardamom": "cardamom green elettaria cardamomum",
+    "cardamom pods": "cardamom green elettaria cardamomum",
+    "elaichi": "cardamom green elettaria cardamomum",
+    "cloves": "cloves syzygium aromaticum",
+    "laung": "cloves syzygium aromaticum",
+    "cinnamon": "cinnamon ground",
+    "cinnamon stick": "cinnamon ground",
+    "bay leaf": "bay leaf dried",
+    "bay leaves": "bay leaf dried",
+    "tej patta": "bay leaf dried",
+    "mustard seeds": "mustard seeds brassica nigra",
+    "rai": "mustard seeds brassica nigra",
+    "asafoetida": "asafoetida ferula assafoetida",
+    "hing": "asafoetida ferula assafoetida",
+    "cashew": "cashew nut anacardium occidentale",
+    "cashews": "cashew nut anacardium occidentale",
+    "cashew nuts": "cashew nut anacardium occidentale",
+    "kaju": "cashew nut anacardium occidentale",
+    "black pepper": "pepper black piper nigrum",
+    "lemon juice": "lemon juice citrus limon",
+    "mint leaves": "mint leaves mentha spicata",
+    "pudina": "mint leaves mentha spicata",
+    "egg": "egg poultry whole raw",
+    "eggs": "egg poultry whole raw",
+    "chicken": "chicken poultry leg skinless",
+    "tamarind": "tamarind pulp tamarindus indica",
+    "jaggery": "jaggery cane saccharum officinarum",
+    "gur": "jaggery cane saccharum officinarum",
+    "spinach": "spinach spinacia oleracea",
+    "palak": "spinach spinacia oleracea",
+    "capsicum": "capsicum green capsicum annuum",
+    "bell pepper": "capsicum green capsicum annuum",
+    "carrot": "carrot orange daucus carota",
+    "carrots": "carrot orange daucus carota",
+    "fenugreek leaves": "fenugreek leaves trigonella foenum graecum",
+    "methi": "fenugreek leaves trigonella foenum graecum",
+}
+
+
+class IngredientResolver:
+    """
+    Resolves ingredient names to nutrition table rows in front of NutritionalValueExtractor.
+
+    Lookups first try an exact hash match on the normalized food names and a curated alias table;
+    only misses go to the fuzzy matcher, and fuzzy results are memoized in a bounded LRU. The
+    lookup tables and the memo are rebuilt whenever the extractor loads a new food index.
+    """
+
+    def __init__(self, extractor: NutritionalValueExtractor, aliases: Dict[str, str] = None, cache_size: int = 4096):
+        """
+        Args:
+            extractor (NutritionalValueExtractor): The extractor used for fuzzy matching and its food index.
+            aliases (Dict[str, str]): Ingredient name -> food table name (or a better query). Defaults to DEFAULT_ALIASES.
+            cache_size (int): Maximum number of memoized fuzzy results.
+        """
+        self.extractor = extractor
+        self.aliases = {
+            self._key(name): self._key(target)
+            for name, target in (DEFAULT_ALIASES if aliases is None else aliases).items()
+        }
+        self.fuzzy_cache = LRUCache(cache_size)
+        self.exact_hits = 0
+        self.alias_hits = 0
+        self.fuzzy_lookups = 0
+
+        self.logger = get_logger("IngredientResolver")
+
+        self._lock = threading.Lock()
+        self._index = None
+        self._exact = {}
+
+    @property
+    def cache_version(self) -> str:
+        """
+        Short hash of the alias table and the extractor's matching settings, which together with the
+        food index determine every resolved ingredient.
+        """
+        source = json.dumps([sorted(self.aliases.items()), self.extractor.match_version])
+        return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return NutritionalValueExtractor.normalize(name)
+
+    def _refresh(self) -> FoodIndex:
+        """
+        Rebuilds the exact-match table and clears the fuzzy memo if the extractor's index changed.
+        """
+        index = self.extractor.index
+        if index is self._index:
+            return index
+        with self._lock:
+            if index is not self._index:
+                exact = {}
+                for position, name in enumerate(index.normalized_names):
+                    exact.setdefault(name, position)
+                missing = sorted({target for target in self.aliases.values() if target not in exact})
+                if missing:
+                    self.logger.warning(f"Alias targets not in the food table, they will be fuzzy matched: {missing}")
+                self.fuzzy_cache.clear()
+                self._exact = exact
+                self._index = index
+                self.logger.info(f"Resolver tables built for {len(exact)} food names")
+        return index
+
+    def resolve_many(self, queries: List[str]) -> Dict[str, Union[List[FoodRecord], Dict[str, str]]]:
+        """
+        Resolves several ingredient names, with the same result shape as NutritionalValueExtractor.search_foods.
+
+        Args:
+            queries (List[str]): The ingredient names to resolve.
+
+        Returns:
+            dict: Maps each query to a list of matched food records (best first) or a warning message.
+        """
+        index = self._refresh()
+        exact = self._exact
+        resolved = {}
+        fuzzy = {}
+        for query in queries:
+            if query in resolved or query in fuzzy:
+                continue
+            key = self._key(query)
+            if key in exact:
+                self.exact_hits += 1
+                metrics.CACHE_LOOKUPS.inc(cache="food_resolver", result="exact")
+                resolved[query] = [index.record(exact[key])]
+                continue
+            if key in self.aliases:
+                self.alias_hits += 1
+                metrics.CACHE_LOOKUPS.inc(cache="food_resolver", result="alias")
+                key = self.aliases[key]
+                if key in exact:
+                    resolved[query] = [index.record(exact[key])]
+                    continue
+            cached = self.fuzzy_cache.get(key)
+            if cached is not None:
+                metrics.CACHE_LOOKUPS.inc(cache="food_resolver", result="memo")
+                resolved[query] = cached
+            else:
+                fuzzy[query] = key
+
+        if fuzzy:
+            self.fuzzy_lookups += len(fuzzy)
+            metrics.CACHE_LOOKUPS.inc(len(fuzzy), cache="food_resolver", result="fuzzy")
+            matches = self.extractor.search_foods(list(fuzzy.values()))
+            for query, key in fuzzy.items():
+                self.fuzzy_cache.set(key, matches[key])
+                resolved[query] = matches[key]
+        return resolved
+
+    def resolve(self, query: str) -> Union[List[FoodRecord], Dict[str, str]]:
+        """
+        Resolves a single ingredient name. See resolve_many.
+        """
+        return self.resolve_many([query])[query]
+
+    def stats(self) -> dict:
+        return {
+            "exact_hits": self.exact_hits,
+            "alias_hits": self.alias_hits,
+            "fuzzy_lookups": self.fuzzy_lookups,
+            "fuzzy_cache": self.fuzzy_cache.stats(),
+        }
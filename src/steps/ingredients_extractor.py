@@ -1,36 +1,28 @@
 import json
-import logging
+import hashlib
 from typing import List, Dict
-from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from src import metrics
+from src.caching import TwoTierCache
+from src.llm import get_chat_model, model_identity
+from src.log import get_logger
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
 
 class IngredientsExtractor:
     """
     Class for extracting ingredients from a recipe name using an LLM-based pipeline.
     """
 
-    def __init__(self):
-        """
-        Initializes the LLM model, output schema, and prompt template.
-        """
-        # Define expected structured output schema
-        self.logging =logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
-        self.response_schemas = [
-            ResponseSchema(
-                name="ingredients",
-                description="List of ingredients with quantities",
-                type="List[Dict[str, str]]"
-            )
-        ]
+    MODEL_NAME = "gemini-1.5-flash"
+    TEMPERATURE = 0.1
 
-        self.output_parser = StructuredOutputParser.from_response_schemas(self.response_schemas)
-        self.format_instructions = self.output_parser.get_format_instructions()
+    # Expected structured output schema
+    RESPONSE_SCHEMA = {
+        "name": "ingredients",
+        "description": "List of ingredients with quantities",
+        "type": "List[Dict[str, str]]"
+    }
 
-        # Define the prompt template
-        self.prompt = PromptTemplate.from_template(
-            """You are an expert multi-cuisine indian chef. Extract ingredients for {recipe_name} with these requirements. Do not add water into ingredients:
+    PROMPT_TEMPLATE = """You are an expert multi-cuisine indian chef. Extract ingredients for {recipe_name} with these requirements. Do not add water into ingredients:
             1. Use ONLY standard Indian measurements (tsp, tbsp, cup, katori, pieces)
                150ml Cup or Katori
                250ml Glass
@@ -50,23 +42,118 @@ class IngredientsExtractor:
                     {{"quantity": "2 tbsp", "ingredient": "oil"}}
                 ]
             }}"""
-        )
 
-        # Initialize the LLM
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            temperature=0.1,
-            model_kwargs={
-                "response_mime_type": "application/json"
-            }
+    def __init__(self, cache: TwoTierCache = None):
+        """
+        Initializes the ingredient cache. The output schema, prompt template, LLM model and chain are
+        built on first use, so langchain is only imported once an extraction actually needs the LLM.
+
+        Args:
+            cache (TwoTierCache): Cache for extracted ingredients. By default it is configured from the
+                INGREDIENT_CACHE_* environment variables (see TwoTierCache.from_env).
+        """
+        self.logger = get_logger(__name__)
+        self._chain = None
+        self._format_instructions = None
+
+        # Cached entries are keyed by prompt/backend/model version, so changing any of them invalidates them automatically
+        self.cache_version = hashlib.sha256(
+            f"{self.PROMPT_TEMPLATE}|{json.dumps(self.RESPONSE_SCHEMA, sort_keys=True)}|{model_identity(self.MODEL_NAME)}|{self.TEMPERATURE}".encode()
+        ).hexdigest()[:16]
+        self.cache = cache if cache is not None else TwoTierCache.from_env(
+            "INGREDIENT_CACHE", ".cache/ingredients.sqlite3"
         )
 
+    def _build_chain(self):
+        """
+        Builds the output parser, prompt template, LLM model and the chain that combines them.
+        """
+        from langchain.output_parsers import StructuredOutputParser, ResponseSchema
+        from langchain.prompts import PromptTemplate
+
+        self.response_schemas = [ResponseSchema(**self.RESPONSE_SCHEMA)]
+        self.output_parser = StructuredOutputParser.from_response_schemas(self.response_schemas)
+        self._format_instructions = self.output_parser.get_format_instructions()
+        self.prompt = PromptTemplate.from_template(self.PROMPT_TEMPLATE)
+        # The Gemini client is shared process-wide
+        self.llm = get_chat_model(self.MODEL_NAME, self.TEMPERATURE)
+
         # Create the chain of operations: prompt -> model -> structured output
-        self.chain = self.prompt | self.llm | self.output_parser
+        self._chain = self.prompt | self.llm | self.output_parser
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            self._build_chain()
+        return self._chain
+
+    @chain.setter
+    def chain(self, chain):
+        self._chain = chain
+
+    @property
+    def format_instructions(self) -> str:
+        if self._format_instructions is None:
+            self._build_chain()
+        return self._format_instructions
+
+    def _cached(self, key: str):
+        return self._validated(self.cache.get(key))
+
+    async def _acached(self, key: str):
+        return self._validated(await self.cache.aget(key))
+
+    def _validated(self, cached):
+        # Entries written before the ingredients were validated are treated as misses
+        if cached is not None and self.clean_ingredients(cached) != cached:
+            cached = None
+        metrics.CACHE_LOOKUPS.inc(cache="ingredients", result="miss" if cached is None else "hit")
+        return cached
+
+    def clean_ingredients(self, ingredients) -> List[Dict[str, str]]:
+        """
+        Validates an extracted ingredient list: every item must be a dictionary with non-empty
+        'ingredient' and 'quantity' strings (numbers are accepted as quantities). Items that cannot
+        be repaired are dropped with a warning.
+
+        Args:
+            ingredients: The 'ingredients' value of the model's response.
+
+        Returns:
+            List[Dict[str, str]]: The valid items, or an empty list if ingredients is not a list.
+        """
+        if not isinstance(ingredients, list):
+            self.logger.warning(f"Ignoring ingredient list of type {type(ingredients).__name__}")
+            return []
+        cleaned = []
+        for item in ingredients:
+            if not isinstance(item, dict):
+                continue
+            ingredient, quantity = item.get("ingredient"), item.get("quantity")
+            if isinstance(quantity, (int, float)) and not isinstance(quantity, bool):
+                quantity = str(quantity)
+            if not isinstance(ingredient, str) or not isinstance(quantity, str) or not ingredient.strip() or not quantity.strip():
+                continue
+            cleaned.append({"quantity": quantity.strip(), "ingredient": ingredient.strip()})
+        if len(cleaned) < len(ingredients):
+            self.logger.warning(f"Dropped {len(ingredients) - len(cleaned)} malformed ingredients")
+        return cleaned
+
+    def _parse(self, result) -> List[Dict[str, str]]:
+        # The chain's structured output: {'ingredients': [...]}
+        return self.clean_ingredients(result.get("ingredients", []) if isinstance(result, dict) else None)
+
+    def cache_key(self, recipe_name: str) -> str:
+        """
+        Returns the cache key for a recipe: the prompt/model version plus the normalized recipe name.
+        """
+        return f"{self.cache_version}:{NutritionalValueExtractor.normalize(recipe_name)}"
 
     def extract_ingredients(self, recipe_name: str) -> List[Dict[str, str]]:
         """
         Extracts a structured list of ingredients for the given recipe name.
+        Results are served from the cache when available; only successful extractions are cached.
+        Malformed items are dropped (see clean_ingredients), so every returned item has both keys.
 
         Args:
             recipe_name (str): The name of the recipe to extract ingredients for.
@@ -74,18 +161,97 @@ class IngredientsExtractor:
         Returns:
             List[Dict[str, str]]: A list of dictionaries containing 'quantity' and 'ingredient' keys.
         """
-        self.logger.info(f"Extracting ingredients for recipe: {recipe_name}")
+        key = self.cache_key(recipe_name)
+        cached = self._cached(key)
+        if cached is not None:
+            self.logger.info("Ingredients for recipe '%s' served from cache.", recipe_name)
+            return cached
+
+        self.logger.info("Extracting ingredients for recipe: %s", recipe_name)
 
         try:
             result = self.chain.invoke({
                 "recipe_name": recipe_name,
                 "format_instructions": self.format_instructions
-            })
+            }, config=metrics.llm_config("extract_ingredients"))
 
-            ingredients = result.get("ingredients", [])
-            self.logger.info(f"Extracted {len(ingredients)} ingredients successfully.")
+            ingredients = self._parse(result)
+            self.logger.info("Extracted %d ingredients successfully.", len(ingredients))
+            if ingredients:
+                self.cache.set(key, ingredients)
             return ingredients
 
         except Exception as e:
             self.logger.error(f"Error extracting ingredients: {e}")
             return []
+
+    async def aextract_ingredients(self, recipe_name: str) -> List[Dict[str, str]]:
+        """
+        Async variant of extract_ingredients that awaits the chain with ainvoke and reads and writes
+        the disk tier of the cache off the event loop.
+
+        Args:
+            recipe_name (str): The name of the recipe to extract ingredients for.
+
+        Returns:
+            List[Dict[str, str]]: A list of dictionaries containing 'quantity' and 'ingredient' keys.
+        """
+        key = self.cache_key(recipe_name)
+        cached = await self._acached(key)
+        if cached is not None:
+            self.logger.info("Ingredients for recipe '%s' served from cache.", recipe_name)
+            return cached
+
+        self.logger.info("Extracting ingredients for recipe: %s", recipe_name)
+
+        try:
+            result = await self.chain.ainvoke({
+                "recipe_name": recipe_name,
+                "format_instructions": self.format_instructions
+            }, config=metrics.llm_config("extract_ingredients"))
+
+            ingredients = self._parse(result)
+            self.logger.info("Extracted %d ingredients successfully.", len(ingredients))
+            if ingredients:
+                await self.cache.aset(key, ingredients)
+            return ingredients
+
+        except Exception as e:
+            self.logger.error(f"Error extracting ingredients: {e}")
+            return []
+
+    def extract_ingredients_batch(self, recipe_names: List[str], max_concurrency: int = 8) -> List[List[Dict[str, str]]]:
+        """
+        Extracts ingredients for several recipes. Cached recipes are served from the cache and the
+        remaining ones are sent through the chain together with chain.batch.
+
+        Args:
+            recipe_names (List[str]): The names of the recipes to extract ingredients for.
+            max_concurrency (int): Maximum number of concurrent LLM calls.
+
+        Returns:
+            List[List[Dict[str, str]]]: The ingredient list of each recipe, in the same order as recipe_names.
+            A recipe whose extraction failed gets an empty list.
+        """
+        keys = [self.cache_key(name) for name in recipe_names]
+        results = [self._cached(key) for key in keys]
+        missing = [position for position, cached in enumerate(results) if cached is None]
+        self.logger.info(f"Extracting ingredients for {len(recipe_names)} recipes, {len(missing)} not cached")
+        if not missing:
+            return results
+
+        outputs = self.chain.batch(
+            [{"recipe_name": recipe_names[position], "format_instructions": self.format_instructions} for position in missing],
+            config={**metrics.llm_config("extract_ingredients"), "max_concurrency": max_concurrency},
+            return_exceptions=True
+        )
+        for position, output in zip(missing, outputs):
+            if isinstance(output, Exception):
+                self.logger.error(f"Error extracting ingredients for '{recipe_names[position]}': {output}")
+                results[position] = []
+                continue
+            ingredients = self._parse(output)
+            if ingredients:
+                self.cache.set(keys[position], ingredients)
+            results[position] = ingredients
+        return results
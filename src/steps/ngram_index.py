@@ -0,0 +1,97 @@
+import math
+import numpy as np
+from typing import Dict, List
+
+
+class NgramIndex:
+    """
+    Sparse TF-IDF index over character n-grams of the food names, used to shortlist fuzzy-match candidates.
+
+    Names are token-sorted before n-gram extraction, like token_sort_ratio compares them, and every
+    name becomes an L2-normalized TF-IDF vector. The vectors are stored as an inverted index in CSR
+    layout (per n-gram: the rows containing it and their weights), so scoring a query only touches the
+    posting lists of its own n-grams instead of every row of the table.
+    """
+
+    def __init__(self, names: List[str], n: int = 3):
+        """
+        Args:
+            names (List[str]): Normalized names, one per table row.
+            n (int): N-gram length.
+        """
+        self.n = n
+        self.size = len(names)
+
+        vocabulary: Dict[str, int] = {}
+        rows, grams, counts = [], [], []
+        for row, name in enumerate(names):
+            for gram, count in self._grams(name).items():
+                rows.append(row)
+                grams.append(vocabulary.setdefault(gram, len(vocabulary)))
+                counts.append(count)
+        self.vocabulary = vocabulary
+
+        rows = np.asarray(rows, dtype=np.int32)
+        grams = np.asarray(grams, dtype=np.int32)
+        document_frequency = np.bincount(grams, minlength=len(vocabulary))
+        self.idf = np.log((1 + self.size) / (1 + document_frequency)) + 1.0
+        weights = np.asarray(counts, dtype=np.float64) * self.idf[grams]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=self.size))
+        weights /= np.where(norms > 0, norms, 1.0)[rows]
+
+        # Group the (row, weight) entries by n-gram
+        order = np.argsort(grams, kind="stable")
+        self.indptr = np.concatenate(([0], np.cumsum(document_frequency)))
+        self.rows = rows[order]
+        self.weights = weights[order].astype(np.float32)
+
+    def _grams(self, text: str) -> Dict[str, int]:
+        padded = f" {' '.join(sorted(text.split()))} "
+        counts: Dict[str, int] = {}
+        for start in range(max(len(padded) - self.n + 1, 1)):
+            gram = padded[start:start + self.n]
+            counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def candidates(self, query: str, limit: int) -> np.ndarray:
+        """
+        Returns the row positions of the names most similar to the query by cosine similarity,
+        best first (ties by position). Rows sharing no n-gram with the query are never returned.
+
+        Args:
+            query (str): Normalized query.
+            limit (int): Maximum number of candidates.
+
+        Returns:
+            np.ndarray: Row positions.
+        """
+        grams, query_weights = [], []
+        for gram, count in self._grams(query).items():
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                grams.append(column)
+                query_weights.append(count * self.idf[column])
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+
+        starts, ends = self.indptr[grams], self.indptr[np.asarray(grams) + 1]
+        rows = np.concatenate([self.rows[s:e] for s, e in zip(starts, ends)])
+        contributions = np.concatenate([
+            self.weights[s:e] * weight for s, e, weight in zip(starts, ends, query_weights)
+        ])
+        # Sum the contributions per touched row only
+        touched, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions)
+
+        if len(touched) > limit:
+            keep = np.argpartition(-scores, limit - 1)[:limit]
+            touched, scores = touched[keep], scores[keep]
+        return touched[np.lexsort((touched, -scores))]
+
+    @staticmethod
+    def candidate_count(top_n: int, size: int) -> int:
+        """
+        Default shortlist length: enough candidates for the re-ranking to recover the fuzzy top_n,
+        growing with the square root of the table size (about 100 for 2k rows, 630 for 100k rows).
+        """
+        return max(20 * top_n, int(2 * math.sqrt(size)))
@@ -1,14 +1,179 @@
-import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
 import re
-import logging
-from rapidfuzz import process, fuzz
-from typing import List, Dict, Union
+import tempfile
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Dict, Tuple, Union
+from src import metrics
+from src.log import SAMPLED, get_logger
+from src.steps.ngram_index import NgramIndex
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass(frozen=True)
+class FoodRecord:
+    """
+    Nutritional values per 100g of a single matched food item.
+    """
+    food_name: str
+    protein_g: float
+    carbohydrate_g: float
+    fat_g: float
+    fibre_g: float
+    energy_kcal: float
+    freesugar_g: float
+    score: float = 100.0
+
+    @property
+    def nutrients(self) -> Tuple[float, ...]:
+        """
+        The nutritional values in FoodIndex.NUTRIENT_COLUMNS order.
+        """
+        return tuple(getattr(self, column) for column in FoodIndex.NUTRIENT_COLUMNS)
+
+
+# Bump when the snapshot layout or normalize changes, so snapshots of older builds are rebuilt
+SNAPSHOT_VERSION = 2
+
+
+def file_checksum(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FoodIndex:
+    """
+    Immutable, array-backed view of the nutrition table.
+
+    Normalized names are kept as a plain list for rapidfuzz, and the nutrient columns as one
+    contiguous read-only NumPy matrix, so a match returned by rapidfuzz (which carries the row
+    position) is resolved with an O(1) array lookup instead of a DataFrame scan.
+    """
+
+    NUTRIENT_COLUMNS = ("protein_g", "carbohydrate_g", "fat_g", "fibre_g", "energy_kcal", "freesugar_g")
+
+    def __init__(self, food_names: List[str], normalized_names: List[str], nutrients: np.ndarray):
+        """
+        Args:
+            food_names (List[str]): Original food names, one per row.
+            normalized_names (List[str]): Normalized food names used for matching, one per row.
+            nutrients (np.ndarray): Matrix of shape (rows, len(NUTRIENT_COLUMNS)) with values per 100g.
+        """
+        if not (len(food_names) == len(normalized_names) == len(nutrients)):
+            raise ValueError("Food names, normalized names and nutrients must have the same length")
+        self.food_names = food_names
+        self.normalized_names = normalized_names
+        self.nutrients = np.ascontiguousarray(nutrients, dtype=np.float64)
+        self.nutrients.flags.writeable = False
+
+    @classmethod
+    def from_dataframe(cls, df: "pd.DataFrame") -> "FoodIndex":
+        """
+        Builds the index from a DataFrame with 'food_name', 'normalized_name' and nutrient columns.
+        Missing or non-numeric nutrient values are stored as 0.
+        """
+        import pandas as pd
+
+        nutrients = np.column_stack([
+            pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+            for column in cls.NUTRIENT_COLUMNS
+        ])
+        return cls(
+            df["food_name"].astype(str).tolist(),
+            df["normalized_name"].tolist(),
+            np.nan_to_num(nutrients, nan=0.0),
+        )
+
+    def __len__(self) -> int:
+        return len(self.normalized_names)
+
+    def save(self, directory: str, checksum: str):
+        """
+        Writes the index as a versioned binary snapshot: the nutrient matrix as a memory-mappable
+        .npy file, the names as JSON and a meta file with the source checksum. The meta file is
+        written last, so an interrupted write never looks like a valid snapshot.
+
+        Args:
+            directory (str): Snapshot directory, created if needed.
+            checksum (str): Checksum of the source CSV the index was built from.
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = {
+            "nutrients.npy": lambda f: np.save(f, np.asarray(self.nutrients)),
+            "names.json": lambda f: f.write(json.dumps({
+                "food_names": list(self.food_names), "normalized_names": list(self.normalized_names)
+            }).encode()),
+            "meta.json": lambda f: f.write(json.dumps({
+                "version": SNAPSHOT_VERSION, "checksum": checksum,
+                "columns": list(self.NUTRIENT_COLUMNS), "rows": len(self)
+            }).encode()),
+        }
+        # Concurrent writers (threads or processes) each use their own temporary files
+        for name, write in files.items():
+            fd, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                # mkstemp creates the file readable by its owner only
+                os.chmod(temporary, 0o644)
+                os.replace(temporary, os.path.join(directory, name))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+    @classmethod
+    def load(cls, directory: str, checksum: str) -> "FoodIndex":
+        """
+        Loads a snapshot written by save, memory-mapping the nutrient matrix instead of copying it.
+
+        Args:
+            directory (str): Snapshot directory.
+            checksum (str): Checksum of the current source CSV.
+
+        Returns:
+            FoodIndex: The index, or None if the snapshot is missing, from another format version,
+            or was built from a different CSV.
+        """
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            if (meta.get("version") != SNAPSHOT_VERSION or meta.get("checksum") != checksum
+                    or meta.get("columns") != list(cls.NUTRIENT_COLUMNS)):
+                return None
+            with open(os.path.join(directory, "names.json")) as f:
+                names = json.load(f)
+            nutrients = np.load(os.path.join(directory, "nutrients.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if nutrients.shape != (meta["rows"], len(cls.NUTRIENT_COLUMNS)) or nutrients.dtype != np.float64:
+            return None
+        return cls(names["food_names"], names["normalized_names"], nutrients)
+
+    def record(self, position: int, score: float = 100.0) -> FoodRecord:
+        """
+        Returns the nutritional record stored at the given row position.
+        """
+        return FoodRecord(self.food_names[position], *self.nutrients[position].tolist(), score=score)
+
+
 class NutritionalValueExtractor:
     """
     A class to extract nutritional information from a CSV dataset based on approximate food name matching.
     """
 
-    def __init__(self, csv_path, score_cutoff=70, top_n=5):
+    MATCHERS = ("fuzzy", "ngram")
+
+    def __init__(self, csv_path, score_cutoff=70, top_n=5, snapshot_dir=None, matcher=None, candidates=None):
         """
         Initializes the extractor with a given CSV file containing nutritional values.
         
@@ -16,39 +181,116 @@ class NutritionalValueExtractor:
             csv_path (str): Path to the CSV file containing food data.
             score_cutoff (int): Minimum fuzzy match score to consider as a match. Default is 70.
             top_n (int): Maximum number of top matches to return. Default is 5.
+            snapshot_dir (str): Directory of the binary snapshot of the food index. Defaults to the
+                'NUTRITION_SNAPSHOT_DIR' environment variable, or the CSV path with a '.snapshot'
+                suffix. An empty string disables snapshots.
+            matcher (str): 'fuzzy' scores every row with token_sort_ratio; 'ngram' shortlists candidates
+                with a character n-gram TF-IDF index and only re-ranks those. Defaults to the
+                'NUTRITION_MATCHER' environment variable, or 'fuzzy'.
+            candidates (int): Shortlist length of the 'ngram' matcher. Defaults to NgramIndex.candidate_count.
         """
         self.csv_path = csv_path
         self.score_cutoff = score_cutoff
         self.top_n = top_n
+        self.matcher = (matcher or os.getenv("NUTRITION_MATCHER", "fuzzy")).strip().lower()
+        if self.matcher not in self.MATCHERS:
+            raise ValueError(f"Unknown matcher '{self.matcher}', expected one of {self.MATCHERS}")
+        self.candidates = candidates
+        self._ngram_index = None
+        self._ngram_source = None
+        self.snapshot_dir = self.default_snapshot_dir(csv_path) if snapshot_dir is None else snapshot_dir
 
         # Setup logger
-        self.logger = logging.getLogger("NutritionSearchEngine")
-        self.logger.setLevel(logging.INFO)
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        ch.setFormatter(formatter)
-        if not self.logger.handlers:
-            self.logger.addHandler(ch)
-
-        self.df = None
+        self.logger = get_logger("NutritionSearchEngine")
+
+        self._df = None
+        self.index = None
+        self.checksum = None
         self.load_data()
 
-    def load_data(self):
+    @property
+    def match_version(self) -> str:
         """
-        Loads and prepares the dataset by reading the CSV file, applying column names,
-        and normalizing the food names for consistent searching.
+        The matching settings (matcher, score cutoff, top_n and shortlist length) that, together with
+        the food index, determine every match. Results derived from the matches can key on it.
         """
-        self.logger.info(f"Loading data from {self.csv_path}")
-        self.df = pd.read_csv(self.csv_path, header=None)
-        self.df.columns = [
+        return f"{self.matcher}:{self.score_cutoff}:{self.top_n}:{self.candidates}"
+
+    @staticmethod
+    def default_snapshot_dir(csv_path: str) -> str:
+        """
+        The 'NUTRITION_SNAPSHOT_DIR' environment variable, or the CSV path with a '.snapshot' suffix.
+        """
+        return os.getenv("NUTRITION_SNAPSHOT_DIR", os.path.splitext(str(csv_path))[0] + ".snapshot")
+
+    @property
+    def df(self) -> "pd.DataFrame":
+        """
+        The full nutrition table as a DataFrame. It is only read from the CSV on first access,
+        since matching uses the array-backed index.
+        """
+        if self._df is None:
+            self._df = self.read_csv()
+        return self._df
+
+    def read_csv(self) -> "pd.DataFrame":
+        """
+        Reads the CSV file, applies column names and normalizes the food names.
+        """
+        import pandas as pd
+
+        df = pd.read_csv(self.csv_path, header=0, names=[
             "food_code", "food_name", "primarysource", "secondarysource",
             "Primary food group", "food_group_nin", "energy_kj", "energy_kcal",
             "carbohydrate_g", "protein_g", "fat_g", "freesugar_g", "fibre_g"
-        ]
-        self.df["normalized_name"] = self.df["food_name"].apply(self.normalize)
+        ])
+        df["normalized_name"] = df["food_name"].apply(self.normalize)
+        return df
+
+    def load_data(self):
+        """
+        Loads the array-backed food index. The shared memory segment named by 'NUTRITION_SHM_NAME'
+        (published by the master process of a multi-worker deployment, see src/shared_index.py) or
+        the binary snapshot is used when its checksum matches the CSV; otherwise the CSV is read and
+        normalized and the snapshot is rebuilt.
+        """
+        self.logger.info(f"Loading data from {self.csv_path}")
+        checksum = file_checksum(self.csv_path)
+        # Build the new index fully before swapping it in, so a reload never exposes a half-prepared table
+        index = self._attach_shared(checksum)
+        if index is None and self.snapshot_dir:
+            index = FoodIndex.load(self.snapshot_dir, checksum)
+            if index is not None:
+                self.logger.info(f"Loaded food index snapshot from {self.snapshot_dir}")
+        df = None
+        if index is None:
+            df = self.read_csv()
+            index = FoodIndex.from_dataframe(df)
+            if self.snapshot_dir:
+                try:
+                    index.save(self.snapshot_dir, checksum)
+                    self.logger.info(f"Rebuilt food index snapshot in {self.snapshot_dir}")
+                except OSError as e:
+                    self.logger.warning(f"Could not write food index snapshot: {e}")
+        self._df, self.index, self.checksum = df, index, checksum
+        if self.matcher == "ngram":
+            # Build the n-gram index now rather than on the first search
+            self.ngram_index
         self.logger.info("Data loaded and normalized successfully.")
 
+    def _attach_shared(self, checksum: str) -> "FoodIndex":
+        shared_name = os.getenv("NUTRITION_SHM_NAME")
+        if not shared_name:
+            return None
+        from src.shared_index import attach
+
+        index = attach(shared_name, checksum)
+        if index is None:
+            self.logger.warning(f"Shared food index '{shared_name}' is missing or outdated, loading a private copy")
+        else:
+            self.logger.info(f"Attached shared food index '{shared_name}'")
+        return index
+
     @staticmethod
     def normalize(text: str) -> str:
         """
@@ -60,49 +302,148 @@ class NutritionalValueExtractor:
         Returns:
             str: A cleaned and normalized version of the input text.
         """
-        text = str(text).lower().strip()
-        text = re.sub(r'[^\w\s]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text
+        text = re.sub(r'[^\w\s]', '', str(text).lower())
+        # Whitespace is collapsed and trimmed last, after removed punctuation may have left some at the ends
+        return re.sub(r'\s+', ' ', text).strip()
 
-    def search_food(self, query: str) -> List[str]:
+    @property
+    def ngram_index(self) -> NgramIndex:
         """
-        Searches for food items that match the given query using fuzzy string matching.
+        The n-gram index of the current food index, built on first use and after every reload.
+        """
+        index = self.index
+        if self._ngram_source is not index:
+            self.logger.info(f"Building n-gram index over {len(index)} foods")
+            self._ngram_index = NgramIndex(index.normalized_names)
+            self._ngram_source = index
+        return self._ngram_index
 
-        Args:
-            query (str): The name of the food item to search for.
+    def _ngram_match(self, query_norm: str) -> List[Tuple[int, float]]:
+        """
+        Shortlists candidates with the n-gram index and re-ranks them with token_sort_ratio.
 
         Returns:
-            list[dict] | dict: A list of dictionaries containing matched food items and their
-            nutritional values (protein, fat, carbohydrates, fibre), or a warning message
-            if no matches are found.
+            List[Tuple[int, float]]: (row position, score) pairs, best first (ties by position).
         """
-        self.logger.info(f"Searching for: '{query}'")
-        query_norm = self.normalize(query)
+        from rapidfuzz import process, fuzz
+
+        index = self.index
+        limit = self.candidates or NgramIndex.candidate_count(self.top_n, len(index))
+        positions = np.sort(self.ngram_index.candidates(query_norm, limit))
         matches = process.extract(
             query_norm,
-            self.df["normalized_name"],
+            [index.normalized_names[position] for position in positions],
             scorer=fuzz.token_sort_ratio,
             limit=self.top_n,
             score_cutoff=self.score_cutoff
         )
+        return [(int(positions[i]), score) for _, score, i in matches]
+
+    def search_food(self, query: str) -> Union[List[FoodRecord], Dict[str, str]]:
+        """
+        Searches for food items that match the given query using fuzzy string matching.
+
+        Args:
+            query (str): The name of the food item to search for.
+
+        Returns:
+            list[FoodRecord] | dict: A list of matched food records (best match first) with their
+            nutritional values per 100g, or a warning message if no matches are found.
+        """
+        from rapidfuzz import process, fuzz
+
+        self.logger.info("Searching for: '%s'", query, extra=SAMPLED)
+        index = self.index
+        query_norm = self.normalize(query)
+        if self.matcher == "ngram":
+            matches = self._ngram_match(query_norm)
+        else:
+            # rapidfuzz returns (choice, score, position); the position addresses the index arrays directly
+            matches = [(position, score) for _, score, position in process.extract(
+                query_norm,
+                index.normalized_names,
+                scorer=fuzz.token_sort_ratio,
+                limit=self.top_n,
+                score_cutoff=self.score_cutoff
+            )]
 
         if not matches:
             warning_msg = f"WARNING: No match found for '{query}'"
+            metrics.FUZZY_MATCH_MISSES.inc()
             self.logger.warning(warning_msg)
             return {"warning": warning_msg}
 
+        results = [index.record(position, score) for position, score in matches]
+
+        self.logger.info("Found %d matches for '%s'", len(results), query, extra=SAMPLED)
+        return results
+
+    def match_many(self, normalized_queries: List[str], chunk_size: int = 1024) -> List[List[Tuple[int, float]]]:
+        """
+        Scores many normalized queries against the whole food table with one rapidfuzz cdist call
+        per chunk of queries (using all CPU cores) and takes the top_n matches of each row.
+
+        The result is identical to running process.extract with token_sort_ratio, score_cutoff and
+        limit=top_n for every query: matches are ordered by score, ties by table position.
+
+        Args:
+            normalized_queries (List[str]): Already normalized query strings.
+            chunk_size (int): Number of queries scored per cdist call, bounding the score matrix size.
+
+        With the 'ngram' matcher every query is shortlisted and re-ranked instead (see _ngram_match).
+
+        Returns:
+            List[List[Tuple[int, float]]]: For each query, (row position, score) pairs, best first.
+        """
+        from rapidfuzz import process, fuzz
+
+        if self.matcher == "ngram":
+            return [self._ngram_match(query) for query in normalized_queries]
+        index = self.index
         results = []
-        for match in matches:
-            matched_name, score = match[0], match[1]
-            row = self.df[self.df["normalized_name"] == matched_name].iloc[0]
-            results.append({
-                "Food Name": row["food_name"],
-                "Protein (g)": row["protein_g"],
-                "Fat (g)": row["fat_g"],
-                "Carbohydrates (g)": row["carbohydrate_g"],
-                "Fibre (g)": row["fibre_g"]
-            })
-
-        self.logger.info(f"Found {len(results)} matches for '{query}'")
+        for start in range(0, len(normalized_queries), chunk_size):
+            scores = process.cdist(
+                normalized_queries[start:start + chunk_size],
+                index.normalized_names,
+                scorer=fuzz.token_sort_ratio,
+                score_cutoff=self.score_cutoff,
+                dtype=np.float64,
+                workers=-1
+            )
+            rows, columns = np.nonzero(scores >= self.score_cutoff)
+            # Sort every candidate by (query row, descending score, table position) in one pass
+            order = np.lexsort((columns, -scores[rows, columns], rows))
+            rows, columns = rows[order], columns[order]
+            bounds = np.searchsorted(rows, np.arange(len(scores) + 1))
+            for row in range(len(scores)):
+                top = columns[bounds[row]:min(bounds[row + 1], bounds[row] + self.top_n)]
+                results.append([(int(column), float(scores[row, column])) for column in top])
         return results
+
+    def search_foods(self, queries: List[str]) -> Dict[str, Union[List[FoodRecord], Dict[str, str]]]:
+        """
+        Searches for several food items in one vectorized pass. Queries that normalize to the same
+        name are matched once.
+
+        Args:
+            queries (List[str]): The names of the food items to search for.
+
+        Returns:
+            dict: Maps each query to its search_food result.
+        """
+        index = self.index
+        by_normalized = {}
+        for query in queries:
+            by_normalized.setdefault(self.normalize(query), query)
+        self.logger.info("Searching for %d distinct foods", len(by_normalized))
+
+        matches = {}
+        for (normalized, query), row in zip(by_normalized.items(), self.match_many(list(by_normalized))):
+            if row:
+                matches[normalized] = [index.record(position, score) for position, score in row]
+            else:
+                warning_msg = f"WARNING: No match found for '{query}'"
+                metrics.FUZZY_MATCH_MISSES.inc()
+                self.logger.warning(warning_msg)
+                matches[normalized] = {"warning": warning_msg}
+        return {query: matches[self.normalize(query)] for query in queries}
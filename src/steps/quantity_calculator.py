@@ -1,56 +1,54 @@
-import pandas as pd
-import logging
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import numpy as np
+from typing import List, Sequence, Tuple
 
 class QuantityCalculator:
-    def __init__(self):
+    """
+    Scales the per-100g nutritional values of matched ingredients by their estimated weights, for one
+    dish (aggregate) or many dishes at once (aggregate_batch). Nothing is rounded here.
+    """
+
+    @staticmethod
+    def aggregate(grams: Sequence[float], nutrients) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Initializes the QuantityCalculator class.
+        Scales the nutritional values of all ingredients of a dish by their weights at once.
+
+        Args:
+            grams (Sequence[float]): Weight in grams of each ingredient.
+            nutrients: Matrix of shape (ingredients, nutrients) with values per 100 grams.
 
-        - Sets up a logger.
-        - Loads the nutrition data from a CSV file path specified in the environment variable 'FILE_PATH'.
-        - Reads the CSV into a DataFrame and sets 'food_code' as the index.
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The per-ingredient matrix of scaled values and the totals
+                per nutrient (one matrix-vector product). Nothing is rounded.
         """
-        self.logger = logging.getLogger("NutritionCalculator")
-        self.logger.setLevel(logging.INFO)
-        self.nutrition_csv_path = os.getenv('FILE_PATH')
-        handler = logging.StreamHandler()
-        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-        if not self.logger.handlers:
-            self.logger.addHandler(handler)
-
-        try:
-            self.df = pd.read_csv(self.nutrition_csv_path)
-            self.df.set_index("food_code", inplace=True)
-            self.logger.info(f"Loaded nutrition data from '{self.nutrition_csv_path}' with {len(self.df)} items.")
-        except Exception as e:
-            self.logger.error(f"Failed to load nutrition data: {e}")
-            raise
-
-    def calculate_total_nutrition(self, quantity_in_grams: float, results: list) -> tuple[list[float], float]:
+        grams = np.asarray(grams, dtype=np.float64).reshape(-1)
+        nutrients = np.asarray(nutrients, dtype=np.float64).reshape(len(grams), np.shape(nutrients)[-1])
+        factors = grams / 100.0
+        return nutrients * factors[:, None], factors @ nutrients
+
+    @staticmethod
+    def aggregate_batch(dishes: List[Tuple[Sequence[float], object]]) -> List[Tuple[np.ndarray, np.ndarray]]:
         """
-        Calculates the total nutritional values based on the quantity provided.
+        Aggregates many dishes in one pass: the ingredients of every dish are stacked into a single
+        grams vector and nutrients matrix, scaled together, and summed per dish.
 
         Args:
-            quantity_in_grams (float): The quantity of food in grams.
-            results (list): A list of nutritional values per 100 grams.
+            dishes (List[Tuple]): (grams, nutrients) per dish, as accepted by aggregate.
 
         Returns:
-            tuple[list[float], float]: A tuple where the first item is a list of scaled nutritional values
-                                       and the second item is their total sum.
+            List[Tuple[np.ndarray, np.ndarray]]: (per-ingredient matrix, totals) per dish, in order.
         """
-        result = []
-        total = 0.0
-        for i in results:
-            try:
-                val = float(i)
-            except (ValueError, TypeError):
-                val = 0.0
-            partial = (quantity_in_grams / 100) * val
-            result.append(partial)
-            total += partial
-        return result, total
-
+        if not dishes:
+            return []
+        grams = [np.asarray(g, dtype=np.float64).reshape(-1) for g, _ in dishes]
+        counts = [len(g) for g in grams]
+        width = max((np.shape(n)[-1] for (_, n), count in zip(dishes, counts) if count), default=0)
+        nutrients = np.concatenate(
+            [np.asarray(n, dtype=np.float64).reshape(count, width) for (_, n), count in zip(dishes, counts)]
+        )
+
+        scaled = nutrients * (np.concatenate(grams) / 100.0)[:, None]
+        totals = np.zeros((len(dishes), width))
+        np.add.at(totals, np.repeat(np.arange(len(dishes)), counts), scaled)
+
+        bounds = np.cumsum([0] + counts)
+        return [(scaled[bounds[i]:bounds[i + 1]], totals[i]) for i in range(len(dishes))]
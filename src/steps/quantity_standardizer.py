@@ -1,31 +1,31 @@
-import logging
+import json
+import asyncio
+import hashlib
 import re
-import pandas as pd
-from langchain_google_genai import ChatGoogleGenerativeAI
+import threading
+from collections import Counter
 from fractions import Fraction
-from typing import Tuple, Union
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from src import metrics
+from src.llm import get_chat_model, is_transient, model_identity
+from src.log import SAMPLED, get_logger
 
 class QuantityStandardizer:
+    MODEL_NAME = "gemini-1.5-flash"
+    TEMPERATURE = 0.3
+    # Minimum rapidfuzz score for matching an ingredient against the density and piece-weight tables
+    TABLE_MATCH_CUTOFF = 90
+
     def __init__(self):
         """
-        Initializes the QuantityStandardizer with a Gemini model instance, logging configuration,
-        and a measurement conversion table for common Indian household units.
+        Initializes the QuantityStandardizer with logging configuration, a measurement conversion
+        table for common Indian household units, and density / piece-weight tables used to convert
+        common ingredients to grams without calling the LLM. The shared Gemini model is only
+        created when the first estimate needs it.
         """
-        # Configure Gemini
-        self.model = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            temperature=0.3,
-            model_kwargs={
-                "response_mime_type": "application/json"
-            }
-        )
+        self._model = None
         # Logger
-        self.logger = logging.getLogger("QuantityStandardizer")
-        self.logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-        if not self.logger.handlers:
-            self.logger.addHandler(handler)
+        self.logger = get_logger("QuantityStandardizer")
 
         # Household measurement standard conversion table (in ml/count for pieces and piece)
         self.measurements = {
@@ -38,7 +38,146 @@ class QuantityStandardizer:
             "teaspoon": 5,
             "tablespoon": 15,
             "teacup": 100,
+            "tsp": 5,
+            "tbsp": 15,
+            "ml": 1,
+            "litre": 1000,
+            "liter": 1000,
+        }
+        # Units that are already weights (in grams)
+        self.weights = {
+            "g": 1,
+            "gm": 1,
+            "gram": 1,
+            "kg": 1000,
+        }
+        self.count_units = {"pieces", "piece", "count"}
+        # Maximum number of items sent to the LLM in one batched prompt
+        self.max_batch_items = 50
+
+        # Grams per ml for common ingredients measured by volume
+        self.densities = {
+            "oil": 0.92,
+            "mustard oil": 0.92,
+            "coconut oil": 0.92,
+            "ghee": 0.91,
+            "butter": 0.96,
+            "milk": 1.03,
+            "curd": 1.03,
+            "yogurt": 1.03,
+            "cream": 1.0,
+            "coconut milk": 1.0,
+            "rice": 0.85,
+            "basmati rice": 0.8,
+            "cooked rice": 0.7,
+            "poha": 0.35,
+            "flour": 0.53,
+            "wheat flour": 0.53,
+            "atta": 0.53,
+            "maida": 0.53,
+            "rice flour": 0.6,
+            "besan": 0.45,
+            "gram flour": 0.45,
+            "semolina": 0.66,
+            "rava": 0.66,
+            "sooji": 0.66,
+            "dal": 0.8,
+            "toor dal": 0.8,
+            "moong dal": 0.8,
+            "masoor dal": 0.8,
+            "chana dal": 0.8,
+            "urad dal": 0.8,
+            "lentil": 0.8,
+            "chickpea": 0.8,
+            "rajma": 0.75,
+            "green pea": 0.65,
+            "sugar": 0.85,
+            "jaggery": 0.9,
+            "honey": 1.42,
+            "salt": 1.2,
+            "turmeric powder": 0.55,
+            "chili powder": 0.45,
+            "chilli powder": 0.45,
+            "coriander powder": 0.4,
+            "cumin powder": 0.45,
+            "cumin seed": 0.4,
+            "mustard seed": 0.6,
+            "garam masala": 0.45,
+            "chaat masala": 0.5,
+            "ginger garlic paste": 1.0,
+            "ginger paste": 1.0,
+            "garlic paste": 1.0,
+            "tomato puree": 1.05,
+            "tamarind paste": 1.1,
+            "chopped onion": 0.6,
+            "chopped tomato": 0.75,
+            "grated coconut": 0.35,
+            "paneer": 0.6,
+        }
+        # Grams per piece for ingredients counted in pieces
+        self.piece_weights = {
+            "onion": 110,
+            "large onion": 150,
+            "small onion": 60,
+            "tomato": 100,
+            "large tomato": 130,
+            "small tomato": 70,
+            "tomato slice": 10,
+            "potato": 150,
+            "egg": 50,
+            "green chili": 5,
+            "green chilli": 5,
+            "chili": 5,
+            "chilli": 5,
+            "dried red chili": 1,
+            "dried red chilli": 1,
+            "garlic clove": 5,
+            "clove": 0.1,
+            "cardamom": 0.2,
+            "cardamom pod": 0.2,
+            "bay leaf": 0.2,
+            "cinnamon stick": 2,
+            "lemon": 60,
+            "carrot": 60,
+            "cucumber": 300,
+            "cucumber slice": 10,
+            "bread slice": 30,
+            "brown bread slice": 30,
+            "banana": 120,
         }
+        # Longer (more specific) names first, so ties in the fuzzy match resolve to the most specific entry
+        self._density_names = sorted(self.densities, key=len, reverse=True)
+        self._piece_names = sorted(self.piece_weights, key=len, reverse=True)
+
+        # Fallback-rate metric: how often the local tables could not answer and the LLM was used.
+        # Estimates run on several threads (batch workers, to_thread), so the counters are updated under a lock
+        self._counters_lock = threading.Lock()
+        self.table_hits = 0
+        self.llm_fallbacks = 0
+        self.table_misses = Counter()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_chat_model(self.MODEL_NAME, self.TEMPERATURE)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    @property
+    def cache_version(self) -> str:
+        """
+        Short hash of everything that determines the gram estimates: the prompts, the LLM backend and
+        model settings and the conversion tables with their match cutoff. Results derived from the estimates can key on it.
+        """
+        source = json.dumps([
+            self._single_prompt("{description}"), self._batch_prompt(["{description}"]),
+            model_identity(self.MODEL_NAME), self.TEMPERATURE,
+            self.measurements, self.weights, self.densities, self.piece_weights, self.TABLE_MATCH_CUTOFF, "token_sort_ratio",
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(source.encode()).hexdigest()[:16]
 
     def normalize_unit(self, unit: str) -> str:
         """
@@ -52,7 +191,11 @@ class QuantityStandardizer:
             str: Normalized unit if found, or original unit for unknowns.
         """
         unit = unit.lower().strip()
-        unit = re.sub(r's$', '', unit)  # remove plural
+        unit = re.sub(r'(?<!s)s$', '', unit)  # remove plural, but keep "glass"
+        if not unit:
+            return "count"  # a bare number is a piece count
+        if unit in self.measurements or unit in self.weights:
+            return unit
         for key in self.measurements:
             if key in unit:
                 return key
@@ -95,61 +238,423 @@ class QuantityStandardizer:
         except Exception as e:
             raise ValueError(f"Invalid quantity format: '{text}'")
 
-    def estimate_grams(self, ingredient: str, quantity_text: str) -> Union[float, dict]:
+    @staticmethod
+    def normalize_ingredient(ingredient: str) -> str:
         """
-        Estimate the weight in grams of an ingredient based on a quantity description.
+        Normalize an ingredient name for table lookups: lowercase, punctuation to spaces and
+        simple plurals removed (e.g. "Green Chillies" -> "green chilli", "tomatoes" -> "tomato").
+
+        Args:
+            ingredient (str): The ingredient name.
 
-        If the unit is a known household measurement, it is converted to ml or count, then
-        a Gemini model is used to estimate the grams. If not known, the raw input is passed
-        to the model for estimation.
+        Returns:
+            str: The normalized ingredient name.
+        """
+        words = re.sub(r'[^a-z0-9]+', ' ', ingredient.lower()).split()
+        singular = []
+        for word in words:
+            if word == "leaves":
+                word = "leaf"
+            elif word.endswith("ies") and len(word) > 4:
+                word = word[:-3] + "i"
+            elif word.endswith("oes"):
+                word = word[:-2]
+            elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+                word = word[:-1]
+            singular.append(word)
+        return " ".join(singular)
+
+    def _lookup(self, table: Dict[str, float], names: list, ingredient: str) -> Optional[float]:
+        """
+        Look up an ingredient in a local table, exactly first and then by fuzzy match of the whole,
+        token-sorted name. Names that only share some words (e.g. 'puffed rice' and 'rice') do not
+        match, so another food's density or piece weight is never used.
+        """
+        if ingredient in table:
+            return table[ingredient]
+        from rapidfuzz import process, fuzz
+
+        match = process.extractOne(ingredient, names, scorer=fuzz.token_sort_ratio, score_cutoff=self.TABLE_MATCH_CUTOFF)
+        return table[match[0]] if match else None
+
+    def table_grams(self, ingredient: str, quantity: float, unit: str) -> Optional[float]:
+        """
+        Convert a parsed quantity to grams using only the local unit, density and piece-weight tables.
 
         Args:
             ingredient (str): The name of the ingredient.
-            quantity_text (str): The text representing quantity and unit.
+            quantity (float): The parsed numeric quantity.
+            unit (str): The normalized unit.
 
         Returns:
-            Union[float, dict]: The estimated weight in grams or an error dictionary if failed.
+            Optional[float]: The weight in grams, or None if the tables cannot answer.
+        """
+        if unit in self.weights:
+            return quantity * self.weights[unit]
+        if unit not in self.measurements:
+            return None
+        name = self.normalize_ingredient(ingredient)
+        if unit in self.count_units:
+            per_piece = self._lookup(self.piece_weights, self._piece_names, name)
+            return None if per_piece is None else quantity * per_piece
+        density = self._lookup(self.densities, self._density_names, name)
+        return None if density is None else quantity * self.measurements[unit] * density
+
+    def fallback_rate(self) -> float:
+        """
+        Fraction of gram estimates that could not be answered by the local tables and went to the LLM.
+        """
+        with self._counters_lock:
+            table_hits, llm_fallbacks = self.table_hits, self.llm_fallbacks
+        total = table_hits + llm_fallbacks
+        return llm_fallbacks / total if total else 0.0
+
+    def stats(self) -> dict:
+        """
+        Table hit/fallback counters and the most frequent misses, to help grow the tables.
         """
-        self.logger.info(f"Estimating grams for: '{quantity_text} of {ingredient}'")
+        with self._counters_lock:
+            table_hits, llm_fallbacks = self.table_hits, self.llm_fallbacks
+            top_misses = self.table_misses.most_common(20)
+        total = table_hits + llm_fallbacks
+        return {
+            "table_hits": table_hits,
+            "llm_fallbacks": llm_fallbacks,
+            "fallback_rate": llm_fallbacks / total if total else 0.0,
+            "top_misses": top_misses,
+        }
+
+    def _prepare(self, ingredient: str, quantity_text: str) -> Tuple[Optional[Union[float, dict]], Optional[str]]:
+        """
+        Parse the quantity and try the local tables.
 
+        Returns:
+            Tuple: (result, None) when the result (grams or an error dictionary) is known locally, or
+            (None, description) where description is the quantity phrase to send to the LLM.
+        """
         try:
             quantity, unit_raw = self.parse_quantity(quantity_text)
             unit = self.normalize_unit(unit_raw)
         except Exception as e:
             self.logger.error(str(e))
-            return {"error": f"Invalid quantity format: '{quantity_text}'"}
+            return {"error": f"Invalid quantity format: '{quantity_text}'"}, None
+
+        grams = self.table_grams(ingredient, quantity, unit)
+        if grams is not None:
+            with self._counters_lock:
+                self.table_hits += 1
+            metrics.GRAM_ESTIMATES.inc(source="table")
+            self.logger.info("Estimated grams from local table: %s", grams, extra=SAMPLED)
+            return grams, None
+
+        miss = f"{self.normalize_ingredient(ingredient)} ({unit})"
+        with self._counters_lock:
+            self.llm_fallbacks += 1
+            if len(self.table_misses) < 10000 or miss in self.table_misses:
+                self.table_misses[miss] += 1
+        metrics.GRAM_ESTIMATES.inc(source="llm")
+        self.logger.info("No local table entry for '%s' (%s), falling back to the LLM", ingredient, unit, extra=SAMPLED)
 
         if unit in self.measurements:
             volume_or_count = self.measurements[unit] * quantity
-            self.logger.info(f"Standardized measurement: {volume_or_count} ml/counts")
-
-            prompt = (
-                f"Estimate the weight in grams of {volume_or_count}ml or equivalent count "
-                f"of '{ingredient}' based on common Indian household measurements. "
-                f"Return only the number in grams, no explanation."
-            )
-        else:
-            prompt = (
-                f"Estimate the weight in grams of {quantity_text} of '{ingredient}' "
-                f"based on common Indian household measurements. "
-                f"Return only the number in grams, no explanation."
-            )
+            self.logger.info("Standardized measurement: %s ml/counts", volume_or_count, extra=SAMPLED)
+            return None, f"{volume_or_count}ml or equivalent count of '{ingredient}'"
+        return None, f"{quantity_text} of '{ingredient}'"
+
+    @staticmethod
+    def _response_text(response) -> str:
+        response_text = response if isinstance(response, str) else getattr(response, "content", None) or getattr(response, "text", None)
+        if not isinstance(response_text, str):
+            raise ValueError("Gemini response is not a valid string")
+        return response_text
 
+    @staticmethod
+    def _llm_config() -> dict:
+        return metrics.llm_config("estimate_grams")
+
+    @staticmethod
+    def _single_prompt(description: str) -> str:
+        return (
+            f"Estimate the weight in grams of {description} "
+            f"based on common Indian household measurements. "
+            f"Return only the number in grams, no explanation."
+        )
+
+    def _parse_grams(self, response) -> float:
+        response_text = self._response_text(response)
+        match = re.search(r"\d+(\.\d+)?", response_text)
+        if not match:
+            raise ValueError("Could not extract number from Gemini response")
+        grams = float(match.group())
+        self.logger.info("Estimated grams: %s", grams, extra=SAMPLED)
+        return grams
+
+    def _llm_failed(self, error: Exception, what: str):
+        # Transient failures that outlived the retries only fail the item. An exhausted deadline budget
+        # (LLMDeadlineExceeded) and non-transient backend errors are re-raised, to fail the whole request.
+        if not is_transient(error):
+            raise error
+        self.logger.error(f"{what} failed: {error}")
+
+    def _grams_from(self, response) -> Union[float, dict]:
         try:
-            response = self.model.invoke(prompt)
+            return self._parse_grams(response)
+        except ValueError as e:
+            self.logger.error(f"Failed to parse Gemini response: {e}")
+            return {"error": "Could not estimate grams."}
 
-            response_text = response if isinstance(response, str) else getattr(response, "content", None) or getattr(response, "text", None)
+    def _estimate_with_llm(self, description: str) -> Union[float, dict]:
+        """
+        Ask the Gemini model for the weight in grams of a single quantity description.
 
-            if not isinstance(response_text, str):
-                raise ValueError("Gemini response is not a valid string")
+        Returns:
+            Union[float, dict]: The grams, or an error dictionary if the answer could not be parsed or the
+            call kept failing with transient errors.
 
-            match = re.search(r"\d+(\.\d+)?", response_text)
-            if not match:
-                raise ValueError("Could not extract number from Gemini response")
+        Raises:
+            LLMDeadlineExceeded: The deadline budget ran out.
+            Exception: A non-transient backend error (see src.llm.is_transient).
+        """
+        try:
+            response = self.model.invoke(self._single_prompt(description), config=self._llm_config())
+        except Exception as e:
+            self._llm_failed(e, "Gram estimation")
+            return {"error": "Could not estimate grams."}
+        return self._grams_from(response)
 
-            grams = float(match.group())
-            self.logger.info(f"Estimated grams: {grams}")
-            return grams
+    async def _aestimate_with_llm(self, description: str) -> Union[float, dict]:
+        """
+        Async variant of _estimate_with_llm.
+        """
+        try:
+            response = await self.model.ainvoke(self._single_prompt(description), config=self._llm_config())
         except Exception as e:
-            self.logger.error(f"Failed to parse Gemini response: {e}")
+            self._llm_failed(e, "Gram estimation")
             return {"error": "Could not estimate grams."}
+        return self._grams_from(response)
+
+    def estimate_grams(self, ingredient: str, quantity_text: str) -> Union[float, dict]:
+        """
+        Estimate the weight in grams of an ingredient based on a quantity description.
+
+        Weights, and known household measurements of ingredients found in the local density or
+        piece-weight tables, are converted directly. Otherwise, if the unit is a known household
+        measurement, it is converted to ml or count, then a Gemini model is used to estimate the
+        grams. If not known, the raw input is passed to the model for estimation.
+
+        Args:
+            ingredient (str): The name of the ingredient.
+            quantity_text (str): The text representing quantity and unit.
+
+        Returns:
+            Union[float, dict]: The estimated weight in grams or an error dictionary if failed.
+        """
+        self.logger.info("Estimating grams for: '%s of %s'", quantity_text, ingredient, extra=SAMPLED)
+
+        result, description = self._prepare(ingredient, quantity_text)
+        if description is None:
+            return result
+        return self._estimate_with_llm(description)
+
+    async def aestimate_grams(self, ingredient: str, quantity_text: str) -> Union[float, dict]:
+        """
+        Async variant of estimate_grams that awaits the model with ainvoke.
+        """
+        self.logger.info("Estimating grams for: '%s of %s'", quantity_text, ingredient, extra=SAMPLED)
+
+        result, description = self._prepare(ingredient, quantity_text)
+        if description is None:
+            return result
+        return await self._aestimate_with_llm(description)
+
+    def _batch_prompt(self, descriptions: List[str]) -> str:
+        lines = "\n".join(f"{i}. {description}" for i, description in enumerate(descriptions))
+        return (
+            "Estimate the weight in grams of each of the following ingredient quantities "
+            "based on common Indian household measurements:\n"
+            f"{lines}\n"
+            'Return only JSON of the form {"items": [{"id": 0, "grams": 120.0}, ...]} '
+            "with one entry per numbered item, no explanation."
+        )
+
+    def _parse_batch_response(self, response, count: int) -> Dict[int, float]:
+        """
+        Parse a batched response into {item id: grams}. Missing or malformed items are
+        simply left out, so the caller can retry them individually.
+        """
+        data = json.loads(self._response_text(response))
+        items = data.get("items", []) if isinstance(data, dict) else data
+        grams_by_id = {}
+        for item in items if isinstance(items, list) else []:
+            try:
+                item_id = int(item["id"])
+                grams = float(item["grams"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= item_id < count and grams >= 0:
+                grams_by_id[item_id] = grams
+        return grams_by_id
+
+    def _prepare_batch(self, items: List[Tuple[str, str]]) -> Tuple[list, List[Tuple[int, str]]]:
+        self.logger.info("Estimating grams for %d ingredients in one batch", len(items))
+        results = [None] * len(items)
+        pending = []
+        for position, (ingredient, quantity_text) in enumerate(items):
+            result, description = self._prepare(ingredient, quantity_text)
+            if description is None:
+                results[position] = result
+            else:
+                pending.append((position, description))
+        return results, pending
+
+    def _chunks(self, pending: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+        size = self.max_batch_items
+        return [pending[start:start + size] for start in range(0, len(pending), size)]
+
+    def _batch_estimates(self, chunk: List[Tuple[int, str]], response) -> Dict[int, float]:
+        """
+        Map a batched response for one chunk back to {item position: grams}.
+        """
+        grams_by_id = self._parse_batch_response(response, len(chunk))
+        return {chunk[item_id][0]: grams for item_id, grams in grams_by_id.items()}
+
+    def _chunk_estimates(self, chunk: List[Tuple[int, str]], response) -> Dict[int, float]:
+        try:
+            return self._batch_estimates(chunk, response)
+        except ValueError as e:
+            self.logger.error(f"Failed to parse batched Gemini response: {e}")
+            return {}
+
+    def _estimate_chunk(self, chunk: List[Tuple[int, str]]) -> Dict[int, float]:
+        # Items left out of the returned estimates fall back to single calls; errors are handled as in _estimate_with_llm
+        if len(chunk) < 2:
+            return {}
+        try:
+            response = self.model.invoke(self._batch_prompt([description for _, description in chunk]), config=self._llm_config())
+        except Exception as e:
+            self._llm_failed(e, "Batched gram estimation")
+            return {}
+        return self._chunk_estimates(chunk, response)
+
+    async def _aestimate_chunk(self, chunk: List[Tuple[int, str]]) -> Dict[int, float]:
+        if len(chunk) < 2:
+            return {}
+        try:
+            response = await self.model.ainvoke(self._batch_prompt([description for _, description in chunk]), config=self._llm_config())
+        except Exception as e:
+            self._llm_failed(e, "Batched gram estimation")
+            return {}
+        return self._chunk_estimates(chunk, response)
+
+    def _merge_batch(self, results: list, pending: List[Tuple[int, str]], estimates: Dict[int, float]) -> List[Tuple[int, str]]:
+        """
+        Fill the batched estimates into results and return the items that still need a single-item call.
+        """
+        failed = []
+        for position, description in pending:
+            if position in estimates:
+                results[position] = estimates[position]
+            else:
+                failed.append((position, description))
+        if failed and len(pending) > 1:
+            self.logger.warning(f"Batched gram estimation fell back to single calls for {len(failed)}/{len(pending)} items")
+        return failed
+
+    def estimate_grams_batch(self, items: List[Tuple[str, str]]) -> List[Union[float, dict]]:
+        """
+        Estimate the weight in grams of several ingredients with as few LLM calls as possible.
+
+        Items answered by the local tables are resolved directly; all remaining (ingredient,
+        standardized quantity) pairs are sent in one structured JSON prompt (or one per
+        max_batch_items items for very large batches). Entries that are missing or malformed in
+        the batched response fall back to single-item calls.
+
+        Args:
+            items (List[Tuple[str, str]]): (ingredient, quantity text) pairs.
+
+        Returns:
+            List[Union[float, dict]]: Estimated grams or an error dictionary, in the same order as items.
+        """
+        results = [None] * len(items)
+        for position, value in self.estimate_grams_stream(items):
+            results[position] = value
+        return results
+
+    def estimate_grams_stream(self, items: List[Tuple[str, str]]) -> Iterator[Tuple[int, Union[float, dict]]]:
+        """
+        Like estimate_grams_batch, but yields (position, grams or error dictionary) as soon as each item
+        is resolved: table hits first, then the items of every batched LLM call, then single-item fallbacks.
+        """
+        results, pending = self._prepare_batch(items)
+        for position, value in enumerate(results):
+            if value is not None:
+                yield position, value
+
+        failed = []
+        for chunk in self._chunks(pending):
+            estimates = self._estimate_chunk(chunk)
+            for position, _ in chunk:
+                if position in estimates:
+                    yield position, estimates[position]
+            failed.extend(self._merge_batch(results, chunk, estimates))
+
+        for position, description in failed:
+            yield position, self._estimate_with_llm(description)
+
+    async def aestimate_grams_batch(self, items: List[Tuple[str, str]],
+                                    semaphore: asyncio.Semaphore = None) -> List[Union[float, dict]]:
+        """
+        Async variant of estimate_grams_batch. Batched chunks and single-item fallbacks run concurrently.
+
+        Args:
+            items (List[Tuple[str, str]]): (ingredient, quantity text) pairs.
+            semaphore (asyncio.Semaphore): Optional limit on concurrent LLM calls.
+
+        Returns:
+            List[Union[float, dict]]: Estimated grams or an error dictionary, in the same order as items.
+        """
+        results = [None] * len(items)
+        async for position, value in self.aestimate_grams_stream(items, semaphore):
+            results[position] = value
+        return results
+
+    async def aestimate_grams_stream(self, items: List[Tuple[str, str]], semaphore: asyncio.Semaphore = None
+                                     ) -> AsyncIterator[Tuple[int, Union[float, dict]]]:
+        """
+        Async variant of estimate_grams_stream. Batched chunks run concurrently and each single-item
+        fallback starts as soon as its chunk has been answered; items are yielded in completion order.
+        """
+        results, pending = self._prepare_batch(items)
+        for position, value in enumerate(results):
+            if value is not None:
+                yield position, value
+
+        semaphore = semaphore or asyncio.Semaphore(8)
+
+        async def chunk_estimates(chunk):
+            async with semaphore:
+                return chunk, await self._aestimate_chunk(chunk)
+
+        async def single_estimate(position, description):
+            async with semaphore:
+                return [(position, await self._aestimate_with_llm(description))]
+
+        tasks = {asyncio.ensure_future(chunk_estimates(chunk)) for chunk in self._chunks(pending)}
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if isinstance(result, list):
+                        yield result[0]
+                        continue
+                    chunk, estimates = result
+                    for position, _ in chunk:
+                        if position in estimates:
+                            yield position, estimates[position]
+                    for position, description in self._merge_batch(results, chunk, estimates):
+                        tasks.add(asyncio.ensure_future(single_estimate(position, description)))
+        finally:
+            # The consumer stopped early (e.g. a client disconnected)
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,82 @@
+import csv
+import os
+import numpy as np
+import pytest
+from src.steps.nutritional_value_extractor import FoodIndex, NutritionalValueExtractor
+
+# (food name, energy_kcal, carbohydrate_g, protein_g, fat_g, freesugar_g, fibre_g), in the CSV column order
+FOODS = [
+    ("Paneer", 258.0, 3.4, 18.9, 20.8, 2.1, 0.0),
+    ("Basmati rice, raw", 356.0, 78.2, 7.9, 0.5, 0.1, 1.8),
+    ("Onion, big", 48.0, 11.0, 1.5, 0.2, 5.4, 2.5),
+    ("Ghee", 897.0, 0.0, 0.0, 99.7, 0.0, 0.0),
+]
+# The nutrition table shipped with the service
+NUTRITION_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "data", "nutrition_source.csv")
+CSV_HEADER = [
+    "food_code", "food_name", "primarysource", "secondarysource", "Primary food group", "food_group_nin",
+    "energy_kj", "energy_kcal", "carb_g", "protein_g", "fat_g", "freesugar_g", "fibre_g",
+]
+
+
+@pytest.fixture
+def nutrition_csv(tmp_path):
+    """
+    A small nutrition CSV in the format of src/data/nutrition_source.csv.
+    """
+    path = tmp_path / "nutrition.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for position, (name, kcal, *values) in enumerate(FOODS):
+            writer.writerow([f"T{position:03d}", name, "test", "", "", "", round(kcal * 4.184), kcal, *values])
+    return str(path)
+
+
+@pytest.fixture
+def food_index():
+    """
+    A FoodIndex of FOODS, with its nutrient columns in FoodIndex.NUTRIENT_COLUMNS order.
+    """
+    names = [name for name, *_ in FOODS]
+    nutrients = np.array([
+        [protein, carbs, fat, fibre, kcal, sugar] for _, kcal, carbs, protein, fat, sugar, fibre in FOODS
+    ])
+    return FoodIndex(names, [NutritionalValueExtractor.normalize(name) for name in names], nutrients)
+
+
+@pytest.fixture
+def table_extractor(tmp_path):
+    """
+    Builds NutritionalValueExtractors over the shipped nutrition table, e.g. table_extractor(matcher="ngram").
+    """
+    def build(**options) -> NutritionalValueExtractor:
+        return NutritionalValueExtractor(NUTRITION_SOURCE, snapshot_dir=str(tmp_path / "snapshot"), **options)
+    return build
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """
+    A pipeline over the shipped nutrition table, answering with the fake LLM backend and caching in
+    memory only.
+    """
+    from src.nutrition_calculator import NutritionPipeline
+
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    for variable in ("INGREDIENT_CACHE_PATH", "RESULT_CACHE_PATH", "DISH_CATALOG_PATH"):
+        monkeypatch.setenv(variable, "")
+    monkeypatch.setenv("NUTRITION_SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    return NutritionPipeline(NUTRITION_SOURCE)
+
+
+@pytest.fixture
+def client(pipeline):
+    """
+    A test client of the API serving the pipeline fixture.
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    main.app.state.pipeline = pipeline
+    return TestClient(main.app)
@@ -0,0 +1,19 @@
+class StubModel:
+    """
+    Chat model stand-in that answers every call with the same text (or with answer(prompt) when answer
+    is callable), or raises the same error.
+    """
+
+    def __init__(self, answer: str = None, error: Exception = None):
+        self.answer = answer
+        self.error = error
+        self.prompts = []
+
+    def invoke(self, prompt, config=None):
+        self.prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        return self.answer(prompt) if callable(self.answer) else self.answer
+
+    async def ainvoke(self, prompt, config=None):
+        return self.invoke(prompt, config)
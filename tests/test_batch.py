@@ -0,0 +1,38 @@
+import json
+import main
+
+
+def test_get_on_the_batch_route_is_not_a_dish(client):
+    response = client.get("/nutrition/batch")
+    assert response.status_code == 405
+    assert response.headers["allow"] == "POST"
+
+
+def test_batch_size_is_limited(client):
+    response = client.post("/nutrition/batch", json={"dish_names": ["dal"] * (main.BATCH_MAX_DISHES + 1)})
+    assert response.status_code == 422
+
+
+def test_failed_dishes_are_reported_inline(client, monkeypatch):
+    pipeline = client.app.state.pipeline
+    extractor = pipeline.ingredients_extractor
+    extractor.cache.set(extractor.cache_key("jeera rice"), [{"quantity": "1 cup", "ingredient": "rice"}])
+    extractor.cache.set(extractor.cache_key("mystery dish"), [])
+    extract_batch = extractor.extract_ingredients_batch
+
+    def extract_or_fail(recipe_names, max_concurrency=8):
+        if "broken dish" in recipe_names:
+            raise RuntimeError("extraction failed")
+        return extract_batch(recipe_names, max_concurrency)
+
+    monkeypatch.setattr(extractor, "extract_ingredients_batch", extract_or_fail)
+    response = client.post("/nutrition/batch", json={"dish_names": ["jeera rice", "Jeera Rice!", "mystery dish", "broken dish"]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["dish_name"] for line in lines] == ["jeera rice", "mystery dish", "broken dish"]
+    assert lines[0]["ingredients"] == [{"quantity": "1 cup", "ingredient": "rice"}]
+    assert "error" not in lines[0]
+    assert lines[1] == {"dish_name": "mystery dish", "error": "Could not extract ingredients"}
+    assert lines[2] == {"dish_name": "broken dish", "error": "extraction failed"}
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import pytest
+from src import caching
+from src.caching import LRUCache, SQLiteCache, TwoTierCache
+
+
+class Clock:
+    """
+    Replaces time.monotonic and time.time in src.caching with a clock the test advances.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(caching.time, "monotonic", clock)
+    monkeypatch.setattr(caching.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def disk_path(tmp_path):
+    return str(tmp_path / "cache" / "results.sqlite3")
+
+
+def test_memory_entries_expire_after_ttl(clock):
+    cache = LRUCache(max_size=4, ttl=60)
+    cache.set("dal", 1)
+    clock.now += 59
+    assert cache.get("dal") == 1
+    clock.now += 2
+    assert cache.get("dal") is None
+    assert len(cache) == 0
+
+
+def test_disk_entries_expire_after_ttl(clock, disk_path):
+    cache = SQLiteCache(disk_path, ttl=60)
+    cache.set("dal", {"kcal": 300})
+    clock.now += 61
+    assert cache.get("dal") is None
+    assert len(cache) == 0
+
+
+def test_disk_hits_are_promoted_to_memory(clock, disk_path):
+    SQLiteCache(disk_path).set("dal", {"kcal": 300})
+    cache = TwoTierCache(LRUCache(), SQLiteCache(disk_path))
+
+    assert cache.get("dal") == {"kcal": 300}
+    assert cache.memory.get("dal") == {"kcal": 300}
+    cache.get("dal")
+    assert cache.stats()["disk"]["hits"] == 1
+
+
+def test_promoted_entries_keep_their_remaining_ttl(clock, disk_path):
+    SQLiteCache(disk_path, ttl=60).set("dal", 1)
+    cache = TwoTierCache(LRUCache(ttl=3600), SQLiteCache(disk_path, ttl=60))
+    clock.now += 50
+    assert cache.get("dal") == 1
+    clock.now += 9
+    assert cache.get("dal") == 1
+    assert cache.stats()["disk"]["hits"] == 1
+    clock.now += 2
+    assert cache.get("dal") is None
+
+
+def test_expired_memory_entry_is_reloaded_from_disk(clock, disk_path):
+    cache = TwoTierCache(LRUCache(ttl=10), SQLiteCache(disk_path, ttl=60))
+    cache.set("dal", 1)
+    clock.now += 11
+    assert cache.get("dal") == 1
+    assert cache.stats()["disk"]["hits"] == 1
+    clock.now += 50
+    assert cache.get("dal") is None
+
+
+class ThreadRecordingDisk(SQLiteCache):
+    """
+    Disk tier that records the thread every read and write runs in.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.threads = []
+
+    def get_with_ttl(self, key, default=None):
+        self.threads.append(threading.get_ident())
+        return super().get_with_ttl(key, default)
+
+    def set(self, key, value):
+        self.threads.append(threading.get_ident())
+        super().set(key, value)
+
+
+def test_async_access_keeps_the_disk_tier_off_the_event_loop(disk_path):
+    disk = ThreadRecordingDisk(disk_path)
+    cache = TwoTierCache(LRUCache(), disk)
+
+    async def use_cache():
+        await cache.aset("dal", {"kcal": 300})
+        cache.memory.clear()
+        assert await cache.aget("dal") == {"kcal": 300}
+        assert await cache.aget("dal") == {"kcal": 300}
+        assert await cache.aget("rasam", "missing") == "missing"
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(use_cache())
+    # One write and two disk reads; the repeated read is a memory hit after promotion
+    assert len(disk.threads) == 3
+    assert loop_thread not in disk.threads
+
+
+def test_from_env(monkeypatch, disk_path):
+    monkeypatch.setenv("RESULT_CACHE_PATH", disk_path)
+    monkeypatch.setenv("RESULT_CACHE_TTL", "0")
+    monkeypatch.setenv("RESULT_CACHE_SIZE", "2")
+    cache = TwoTierCache.from_env("RESULT_CACHE")
+    assert cache.memory.max_size == 2 and cache.memory.ttl is None
+    assert cache.disk.path == disk_path
+
+    monkeypatch.setenv("RESULT_CACHE_PATH", "")
+    assert TwoTierCache.from_env("RESULT_CACHE").disk is None
@@ -0,0 +1,23 @@
+from src.catalog import DishCatalog, compute_entries
+from tests.stubs import StubModel
+
+
+def test_only_complete_dishes_are_stored(pipeline):
+    extracted = {
+        "jeera rice": [{"quantity": "1 cup", "ingredient": "rice"}, {"quantity": "1 tsp", "ingredient": "cumin seeds"}],
+        "saffron rice": [{"quantity": "1 cup", "ingredient": "rice"}, {"quantity": "1 pinch", "ingredient": "saffron"}],
+        "mystery dish": [],
+    }
+    for dish_name, ingredients in extracted.items():
+        pipeline.ingredients_extractor.cache.set(pipeline.ingredients_extractor.cache_key(dish_name), ingredients)
+    pipeline.quantity_standardizer.model = StubModel(error=ConnectionError("reset"))
+    catalog = DishCatalog()
+
+    errors = compute_entries(pipeline, catalog, extracted)
+
+    assert errors == {
+        "saffron rice": "Could not estimate the weight of: saffron",
+        "mystery dish": "Could not extract ingredients",
+    }
+    assert len(catalog) == 1
+    assert catalog.get("jeera rice", pipeline.result_version) is not None
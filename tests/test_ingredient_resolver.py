@@ -0,0 +1,49 @@
+import pytest
+from src.steps.ingredient_resolver import DEFAULT_ALIASES, IngredientResolver
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+
+@pytest.fixture
+def resolver(table_extractor):
+    return IngredientResolver(table_extractor())
+
+
+def normalized_name(matches) -> str:
+    return NutritionalValueExtractor.normalize(matches[0].food_name)
+
+
+def test_alias_targets_are_table_rows(resolver):
+    names = set(resolver.extractor.index.normalized_names)
+    assert sorted(set(DEFAULT_ALIASES.values()) - names) == []
+
+
+@pytest.mark.parametrize("query, target", [
+    ("Haldi", "turmeric powder curcuma domestica"),
+    ("jeera", "cumin seeds cuminum cyminum"),
+    ("Green Chillies", "chillies green all varieties capsicum annum"),
+    ("toor dal", "red gram dal cajanus cajan"),
+])
+def test_aliases_resolve_without_fuzzy_matching(resolver, query, target):
+    matches = resolver.resolve(query)
+    assert normalized_name(matches) == target
+    assert matches[0].score == 100.0
+    assert resolver.stats()["alias_hits"] == 1
+    assert resolver.stats()["fuzzy_lookups"] == 0
+
+
+def test_table_names_resolve_exactly(resolver):
+    assert normalized_name(resolver.resolve("Paneer")) == "paneer"
+    assert (resolver.stats()["exact_hits"], resolver.stats()["alias_hits"]) == (1, 0)
+
+
+def test_other_names_are_fuzzy_matched_once(resolver):
+    first = resolver.resolve_many(["panner", "panner"])["panner"]
+    assert first == resolver.extractor.search_food("panner")
+    assert resolver.resolve("panner") == first
+    assert resolver.stats()["fuzzy_lookups"] == 1
+
+
+def test_alias_target_missing_from_the_table_is_fuzzy_matched(table_extractor):
+    resolver = IngredientResolver(table_extractor(), aliases={"paneer tikka masala": "panner"})
+    assert resolver.resolve("Paneer Tikka Masala") == resolver.extractor.search_food("panner")
+    assert (resolver.stats()["alias_hits"], resolver.stats()["fuzzy_lookups"]) == (1, 1)
@@ -0,0 +1,60 @@
+import logging
+import os
+import subprocess
+import sys
+from src.log import SAMPLED, SamplingFilter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_logging(script: str, **env) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, timeout=60,
+        env={**os.environ, "PYTHONPATH": REPO_ROOT, **env},
+    )
+
+
+def test_queued_records_are_flushed_on_exit():
+    completed = run_logging(
+        "from src.log import get_logger\n"
+        "logger = get_logger('test')\n"
+        "for i in range(2000):\n"
+        "    logger.info('record %d', i)\n",
+        LOG_SAMPLE_EVERY="1",
+    )
+    assert completed.returncode == 0
+    lines = [line for line in completed.stderr.splitlines() if "record" in line]
+    assert len(lines) == 2000
+    assert lines[-1].endswith("INFO - record 1999")
+
+
+def test_forked_child_flushes_its_own_records():
+    completed = run_logging(
+        "import os\n"
+        "from src.log import get_logger\n"
+        "logger = get_logger('test')\n"
+        "logger.info('parent')\n"
+        "pid = os.fork()\n"
+        "if pid == 0:\n"
+        "    logger.info('child')\n"
+        "else:\n"
+        "    os.waitpid(pid, 0)\n",
+    )
+    assert completed.returncode == 0
+    assert completed.stderr.count("INFO - child") == 1
+    assert completed.stderr.count("INFO - parent") == 1
+
+
+def test_sampling_keeps_every_nth_record_per_template():
+    sampling = SamplingFilter(every=3)
+
+    def record(message: str, sampled: bool = True) -> logging.LogRecord:
+        record = logging.LogRecord("test", logging.INFO, __file__, 0, message, ("x",), None)
+        if sampled:
+            record.__dict__.update(SAMPLED)
+        return record
+
+    kept = [sampling.filter(record("match %s")) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampling.filter(record("search %s"))
+    assert all(sampling.filter(record("match %s", sampled=False)) for _ in range(3))
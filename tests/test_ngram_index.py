@@ -0,0 +1,31 @@
+import pytest
+from src.fake_llm import INGREDIENT_POOL
+from src.steps.ingredient_resolver import DEFAULT_ALIASES
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+
+@pytest.fixture
+def matchers(table_extractor):
+    return table_extractor(matcher="fuzzy"), table_extractor(matcher="ngram")
+
+
+def test_ngram_matcher_finds_every_table_name(matchers):
+    fuzzy, ngram = matchers
+    names = list(fuzzy.index.normalized_names)
+    assert [matches[:1] for matches in ngram.match_many(names)] == [matches[:1] for matches in fuzzy.match_many(names)]
+
+
+def test_ngram_matcher_only_misses_weak_matches(matchers):
+    # Ingredient names as the pipeline sees them, misspellings, and single words of the table's names.
+    # The shortlist can miss a best match scoring just above the cutoff, never a clear one.
+    fuzzy, ngram = matchers
+    queries = set(DEFAULT_ALIASES) | {name for name, _ in INGREDIENT_POOL} | {"panner", "tomatos", "chiken", "bhindi"}
+    queries |= {word for name in fuzzy.index.normalized_names for word in name.split()[:1]}
+    queries = sorted(NutritionalValueExtractor.normalize(query) for query in queries)
+
+    misses = {}
+    for query, expected, found in zip(queries, fuzzy.match_many(queries), ngram.match_many(queries)):
+        if found[:1] != expected[:1]:
+            misses[query] = expected[0][1]
+    assert len(misses) <= 0.02 * len(queries)
+    assert all(score < fuzzy.score_cutoff + 15 for score in misses.values()), misses
@@ -0,0 +1,36 @@
+import pytest
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Dal Tadka", "dal tadka"),
+    ("dal tadka .", "dal tadka"),
+    ("  (Paneer)  Butter-Masala!! ", "paneer buttermasala"),
+    ("aloo\t\ngobi", "aloo gobi"),
+])
+def test_normalize(text, expected):
+    assert NutritionalValueExtractor.normalize(text) == expected
+
+
+# Ingredient names as the LLM writes them: table names, spelling variants, duplicates and misses
+QUERIES = [
+    "rice", "basmati rice", "toor dal", "arhar dal", "paneer", "ghee", "onion", "tomatoes", "green chilli",
+    "garam masala", "jeera", "cumin seeds", "curd", "yoghurt", "butter", "wheat flour", "atta", "milk",
+    "panner", "tomato", "rice", "chick peas", "coriander leaves", "xyzzy", "",
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1024, 4])
+def test_match_many_equals_process_extract(table_extractor, chunk_size):
+    from rapidfuzz import fuzz, process
+
+    extractor = table_extractor(matcher="fuzzy")
+    queries = [NutritionalValueExtractor.normalize(query) for query in QUERIES]
+    expected = [
+        [(position, score) for _, score, position in process.extract(
+            query, extractor.index.normalized_names, scorer=fuzz.token_sort_ratio,
+            limit=extractor.top_n, score_cutoff=extractor.score_cutoff
+        )]
+        for query in queries
+    ]
+    assert extractor.match_many(queries, chunk_size=chunk_size) == expected
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from src.llm import LLMDeadlineExceeded
+from src.steps.quantity_standardizer import QuantityStandardizer
+from tests.stubs import StubModel
+
+
+def standardizer_with(model) -> QuantityStandardizer:
+    standardizer = QuantityStandardizer()
+    standardizer.model = model
+    return standardizer
+
+
+# Quantities the tables cannot answer, so they go to the model
+LLM_ITEMS = [("saffron strands", "1 pinch"), ("tamarind pulp", "1 small ball")]
+
+
+@pytest.fixture(params=["sync", "async"])
+def estimate(request):
+    def estimate(standardizer: QuantityStandardizer, items):
+        if request.param == "async":
+            return asyncio.run(standardizer.aestimate_grams_batch(items))
+        return standardizer.estimate_grams_batch(items)
+    return estimate
+
+
+@pytest.mark.parametrize("error", [LLMDeadlineExceeded("budget exhausted"), PermissionError("invalid API key")])
+def test_deadline_and_non_transient_errors_fail_the_estimate(estimate, error):
+    with pytest.raises(type(error)):
+        estimate(standardizer_with(StubModel(error=error)), LLM_ITEMS)
+
+
+def test_transient_errors_only_fail_the_item(estimate):
+    results = estimate(standardizer_with(StubModel(error=ConnectionError("reset"))), LLM_ITEMS + [("ghee", "1 tbsp")])
+    assert results[:2] == [{"error": "Could not estimate grams."}] * 2
+    assert results[2] == pytest.approx(15 * 0.91)
+
+
+def test_unparseable_answer_only_fails_the_item(estimate):
+    results = estimate(standardizer_with(StubModel(answer="about a handful")), LLM_ITEMS)
+    assert results == [{"error": "Could not estimate grams."}] * 2
+
+
+@pytest.mark.parametrize("ingredient, quantity, grams", [
+    ("rice", "250 g", 250),
+    ("Basmati Rice", "0.5 kg", 500),
+    ("oil", "2 tbsp", 2 * 15 * 0.92),
+    ("Ghee", "1 tsp", 5 * 0.91),
+    ("rice", "1 cup", 150 * 0.85),
+    ("Onions", "2", 2 * 110),
+    ("eggs", "3 pieces", 3 * 50),
+])
+def test_table_conversions_skip_the_llm(estimate, ingredient, quantity, grams):
+    model = StubModel(error=AssertionError("the tables should answer"))
+    standardizer = standardizer_with(model)
+    assert estimate(standardizer, [(ingredient, quantity)]) == [pytest.approx(grams)]
+    assert standardizer.stats()["table_hits"] == 1
+    assert model.prompts == []
+
+
+def test_partial_name_matches_go_to_the_llm(estimate):
+    # 'puffed rice' shares a word with 'rice' but is far lighter, so the rice density must not be used
+    model = StubModel(answer="14")
+    standardizer = standardizer_with(model)
+    assert estimate(standardizer, [("puffed rice", "1 cup")]) == [pytest.approx(14)]
+    assert len(model.prompts) == 1
+    stats = standardizer.stats()
+    assert (stats["table_hits"], stats["llm_fallbacks"], stats["fallback_rate"]) == (0, 1, 1.0)
+    assert stats["top_misses"] == [("puffed rice (cup)", 1)]
+
+
+BATCH_ITEMS = LLM_ITEMS + [("kokum", "3 pieces")]
+
+
+def batch_or_single(batch_answer: str, single_answer: str = "7"):
+    # Answers batched prompts (numbered items) with batch_answer and single-item prompts with single_answer
+    return lambda prompt: batch_answer if "\n0. " in prompt else single_answer
+
+
+def test_batch_is_answered_in_one_call(estimate):
+    model = StubModel(answer=batch_or_single('{"items": [{"id": 0, "grams": 0.3}, {"id": 1, "grams": 20}, {"id": 2, "grams": "12.5"}]}'))
+    assert estimate(standardizer_with(model), BATCH_ITEMS + [("ghee", "1 tbsp")]) == [0.3, 20, 12.5, pytest.approx(15 * 0.91)]
+    assert len(model.prompts) == 1
+
+
+def test_missing_and_malformed_batch_items_fall_back_to_single_calls(estimate):
+    # Item 1 has no usable weight, item 2 is missing and id 5 does not exist
+    model = StubModel(answer=batch_or_single('{"items": [{"id": 0, "grams": 0.3}, {"id": 1, "grams": "lots"}, {"id": 5, "grams": 40}]}'))
+    assert estimate(standardizer_with(model), BATCH_ITEMS) == [0.3, 7, 7]
+    assert len(model.prompts) == 3
+    assert all("\n0. " not in prompt for prompt in model.prompts[1:])
+
+
+def test_unparseable_batch_falls_back_to_single_calls(estimate):
+    model = StubModel(answer=batch_or_single("Sorry, I can't help with that."))
+    assert estimate(standardizer_with(model), BATCH_ITEMS) == [7, 7, 7]
+    assert len(model.prompts) == 1 + len(BATCH_ITEMS)
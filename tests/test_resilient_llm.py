@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from src.fake_llm import FakeChatModel
+from src.llm import LLMDeadlineExceeded, LLMSettings, deadline
+from src.resilient_llm import ResilientChatModel
+
+PROMPT = "Extract ingredients for dal tadka with these requirements"
+
+_calls_lock = threading.Lock()
+
+
+class ScriptedChatModel(FakeChatModel):
+    """
+    The offline fake model, with its first calls failing (ConnectionError) and then stalling for slow_ms.
+    """
+
+    failures: int = 0
+    slow_calls: int = 0
+    slow_ms: float = 0.0
+    calls: int = 0
+
+    def _next_delay(self) -> float:
+        with _calls_lock:
+            self.calls += 1
+            call = self.calls
+        if call <= self.failures:
+            raise ConnectionError(f"call {call} failed")
+        return self.slow_ms / 1000 if call <= self.failures + self.slow_calls else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._next_delay())
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._next_delay())
+        return self._result(messages)
+
+
+def invoke(model: ResilientChatModel, mode: str):
+    if mode == "async":
+        return asyncio.run(model.ainvoke(PROMPT))
+    return model.invoke(PROMPT)
+
+
+def resilient(settings: LLMSettings = None, **script) -> ResilientChatModel:
+    settings = settings or LLMSettings(timeout=2.0, backoff_base=0.01, backoff_max=0.01)
+    return ResilientChatModel(ScriptedChatModel(**script), settings)
+
+
+@pytest.fixture(params=["sync", "async"])
+def mode(request):
+    return request.param
+
+
+def test_transient_failures_are_retried(mode):
+    model = resilient(failures=2)
+    answer = invoke(model, mode)
+    assert json.loads(answer.content)["ingredients"]
+    assert model.client.calls == 3
+
+
+def test_gives_up_after_max_retries(mode):
+    model = resilient(failures=5)
+    with pytest.raises(ConnectionError):
+        invoke(model, mode)
+    assert model.client.calls == 3
+
+
+def test_deadline_bounds_a_slow_call(mode):
+    model = resilient(slow_calls=1, slow_ms=1000)
+    start = time.monotonic()
+    with deadline(0.1), pytest.raises(LLMDeadlineExceeded):
+        invoke(model, mode)
+    assert time.monotonic() - start < 0.5
+    # Running out of the budget is not retried
+    assert model.client.calls == 1
+
+
+def test_exhausted_deadline_makes_no_call(mode):
+    model = resilient()
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(LLMDeadlineExceeded):
+            invoke(model, mode)
+    assert model.client.calls == 0
+
+
+def test_slow_call_is_hedged(mode):
+    settings = LLMSettings(timeout=2.0, hedge_percentile=50, hedge_min_samples=1)
+    model = resilient(settings, slow_calls=1, slow_ms=1000)
+    model.latencies.record(0.02)
+    start = time.monotonic()
+    answer = invoke(model, mode)
+    assert time.monotonic() - start < 0.5
+    assert json.loads(answer.content)["ingredients"]
+    assert model.client.calls == 2
+
+
+def test_no_hedge_before_enough_samples(mode):
+    settings = LLMSettings(timeout=2.0, hedge_percentile=50, hedge_min_samples=5)
+    model = resilient(settings, slow_calls=1, slow_ms=100)
+    invoke(model, mode)
+    assert model.client.calls == 1
@@ -0,0 +1,57 @@
+import pytest
+from tests.stubs import StubModel
+
+
+def extracted(pipeline, dish_name, ingredients):
+    # Seeds the ingredient cache, so the dish is computed from these ingredients
+    pipeline.ingredients_extractor.cache.set(pipeline.ingredients_extractor.cache_key(dish_name), ingredients)
+
+
+def test_results_carry_an_etag_and_revalidate_with_304(client):
+    extracted(client.app.state.pipeline, "jeera rice", [{"quantity": "1 cup", "ingredient": "rice"}, {"quantity": "1 tsp", "ingredient": "cumin seeds"}])
+    response = client.get("/nutrition/jeera rice")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("public")
+    assert response.json()["data"]["errors"] == []
+    etag = response.headers["etag"]
+
+    revalidated = client.get("/nutrition/Jeera Rice", headers={"If-None-Match": f"W/{etag}, \"other\""})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+
+def test_dish_without_ingredients_is_not_stored(client):
+    pipeline = client.app.state.pipeline
+    extracted(pipeline, "mystery dish", [])
+    response = client.get("/nutrition/mystery dish")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert pipeline.result_cache.get(pipeline.result_key("mystery dish")) is None
+
+
+def test_failed_gram_estimates_are_reported_and_not_stored(client):
+    pipeline = client.app.state.pipeline
+    extracted(pipeline, "saffron rice", [{"quantity": "1 cup", "ingredient": "rice"}, {"quantity": "1 pinch", "ingredient": "saffron"}])
+    pipeline.quantity_standardizer.model = StubModel(error=ConnectionError("reset"))
+
+    response = client.get("/nutrition/saffron rice")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    data = response.json()["data"]
+    assert data["incomplete"] is True
+    assert [error["ingredient"] for error in data["errors"]] == ["saffron"]
+    assert pipeline.result_cache.get(pipeline.result_key("saffron rice")) is None
+
+
+def test_failed_calculation_is_a_500_nobody_keeps(client, monkeypatch):
+    async def fail(dish_name, timings=None):
+        raise RuntimeError("extraction failed")
+
+    monkeypatch.setattr(client.app.state.pipeline, "_acalculate_shared", fail)
+    response = client.get("/nutrition/jeera rice")
+    assert response.status_code == 500
+    assert response.headers["cache-control"] == "no-store"
+    assert response.json() == {"error": "extraction failed"}
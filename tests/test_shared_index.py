@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from src import shared_index
+from src.steps.nutritional_value_extractor import NutritionalValueExtractor, file_checksum
+
+
+@pytest.fixture
+def segment(food_index):
+    segment = shared_index.publish(food_index, "checksum")
+    yield segment
+    shared_index.release(segment)
+
+
+def test_attach_maps_the_published_index(segment, food_index):
+    index = shared_index.attach(segment.name, "checksum")
+    # Names are decoded from the segment on access
+    assert isinstance(index.food_names, shared_index.SharedStrings)
+    assert list(index.food_names) == food_index.food_names
+    assert index.food_names[-1] == food_index.food_names[-1]
+    assert index.normalized_names == food_index.normalized_names
+    np.testing.assert_array_equal(index.nutrients, food_index.nutrients)
+    assert not index.nutrients.flags.writeable
+
+
+def test_attach_rejects_other_csv_and_missing_segments(segment):
+    assert shared_index.attach(segment.name, "other") is None
+    assert shared_index.attach("nutrition-test-missing") is None
+
+
+def test_extractor_attaches_the_shared_index(monkeypatch, nutrition_csv):
+    segment = shared_index.publish_csv(nutrition_csv, snapshot_dir="")
+    try:
+        monkeypatch.setenv("NUTRITION_SHM_NAME", segment.name)
+        extractor = NutritionalValueExtractor(nutrition_csv, snapshot_dir="")
+        assert isinstance(extractor.index.food_names, shared_index.SharedStrings)
+        assert extractor.checksum == file_checksum(nutrition_csv)
+        assert extractor.search_food("paneer")[0].food_name == "Paneer"
+    finally:
+        shared_index.release(segment)
+
+
+def test_extractor_ignores_an_outdated_shared_index(monkeypatch, nutrition_csv, segment):
+    monkeypatch.setenv("NUTRITION_SHM_NAME", segment.name)
+    extractor = NutritionalValueExtractor(nutrition_csv, snapshot_dir="")
+    assert isinstance(extractor.index.food_names, list)
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"dish": "dal"}
+
+    def caller():
+        started.wait()
+        results.append(flight.do("dal", compute))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0][0] for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 7}
+
+
+def test_followers_receive_the_leaders_error():
+    flight = SingleFlight()
+    leader_running = threading.Event()
+    errors = []
+
+    def compute():
+        leader_running.set()
+        time.sleep(0.1)
+        raise ValueError("extraction failed")
+
+    def caller():
+        try:
+            flight.do("dal", compute)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    leader_running.wait()
+    follower = threading.Thread(target=caller)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.coalesced == 1
+
+
+def test_finished_calls_are_not_cached():
+    flight = SingleFlight()
+    counter = iter(range(10))
+    assert flight.do("dal", lambda: next(counter)) == (0, False)
+    assert flight.do("dal", lambda: next(counter)) == (1, False)
+
+
+def test_async_callers_share_one_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.ado("dal", compute) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["result"] * 10
+    assert sum(shared for _, shared in results) == 9
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_async_caller_does_not_cancel_the_shared_task():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        first = asyncio.ensure_future(flight.ado("dal", compute))
+        second = asyncio.ensure_future(flight.ado("dal", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == ("result", True)
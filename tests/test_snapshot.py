@@ -0,0 +1,33 @@
+import os
+import threading
+import numpy as np
+from src.steps.nutritional_value_extractor import FoodIndex
+
+
+def assert_same_index(index: FoodIndex, expected: FoodIndex):
+    assert list(index.food_names) == list(expected.food_names)
+    assert list(index.normalized_names) == list(expected.normalized_names)
+    np.testing.assert_array_equal(index.nutrients, expected.nutrients)
+
+
+def test_snapshot_round_trip(tmp_path, food_index):
+    food_index.save(str(tmp_path), "checksum")
+    loaded = FoodIndex.load(str(tmp_path), "checksum")
+    assert_same_index(loaded, food_index)
+    assert not loaded.nutrients.flags.writeable
+
+
+def test_snapshot_of_another_csv_is_ignored(tmp_path, food_index):
+    food_index.save(str(tmp_path), "checksum")
+    assert FoodIndex.load(str(tmp_path), "other") is None
+    assert FoodIndex.load(str(tmp_path / "missing"), "checksum") is None
+
+
+def test_concurrent_snapshot_writers(tmp_path, food_index):
+    threads = [threading.Thread(target=food_index.save, args=(str(tmp_path), "checksum")) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert_same_index(FoodIndex.load(str(tmp_path), "checksum"), food_index)
+    assert sorted(os.listdir(tmp_path)) == ["meta.json", "names.json", "nutrients.npy"]
@@ -0,0 +1,46 @@
+import json
+
+INGREDIENTS = [
+    {"quantity": "1 cup", "ingredient": "rice"},
+    {"quantity": "1 pinch", "ingredient": "saffron"},
+    {"quantity": "1 tsp", "ingredient": "xyzzy"},
+    {"quantity": "1 tbsp", "ingredient": "ghee"},
+]
+
+
+def read_events(response) -> list:
+    # Parses a text/event-stream body into (event, data) pairs
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_events_arrive_in_order_and_are_replayed_from_the_cache(client):
+    pipeline = client.app.state.pipeline
+    pipeline.ingredients_extractor.cache.set(pipeline.ingredients_extractor.cache_key("saffron rice"), INGREDIENTS)
+
+    response = client.get("/nutrition/saffron rice/stream")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    assert [event for event, _ in events] == ["ingredients"] + ["ingredient"] * 4 + ["result"]
+    assert events[0][1] == {"dish_name": "saffron rice", "ingredients": INGREDIENTS}
+    # Ingredients without a match are reported first, the others as their weights resolve
+    assert events[1][1] == {"ingredient": "xyzzy", "error": "No matching food in the nutrition table"}
+    assert sorted(data["ingredient"] for _, data in events[2:5]) == ["ghee", "rice", "saffron"]
+    result = events[-1][1]
+    assert events[-2][1]["totals"] == result["estimated_nutrition"][0]
+
+    replayed = read_events(client.get("/nutrition/Saffron Rice/stream"))
+    assert replayed == [("ingredients", {"dish_name": "Saffron Rice", "ingredients": INGREDIENTS})] + events[1:]
+    assert pipeline.result_cache.stats()["memory"]["hits"] == 1
+    assert client.get("/nutrition/saffron rice").json() == {"data": result, "ingredients": INGREDIENTS}
+
+
+def test_sync_stream_stores_the_result_for_replay(pipeline):
+    pipeline.ingredients_extractor.cache.set(pipeline.ingredients_extractor.cache_key("saffron rice"), INGREDIENTS)
+    events = list(pipeline.stream("saffron rice"))
+    assert [event["event"] for event in events] == ["ingredients"] + ["ingredient"] * 4 + ["result"]
+    assert list(pipeline.stream("saffron rice")) == events
+    assert pipeline.result_cache.stats()["memory"]["hits"] == 1